@@ -0,0 +1,185 @@
+import argparse, io, json, os, platform, random, statistics, sys, time, tracemalloc, zipfile
+from datetime import datetime, timezone
+
+import gherkin_backend as gb
+
+MODES = ('optimized', 'atomized', 'ultra-optimized')
+STAGES = ('parse', 'overview', 'render_docx', 'render_ts')
+THEME_WORDS = ['login', 'search', 'export', 'audit', 'billing', 'profile', 'reporting', 'security', 'notifications', 'upload',
+               'permissions', 'checkout', 'inventory', 'scheduling', 'payments', 'dashboard']
+ACTORS = ['admin', 'auditor', 'end user', 'operator', 'guest']
+
+def synthetic_paragraphs(requirements: int, fits: int, themes: int, plain_ratio: float = 0.2, seed: int = 0):
+    # paragraph texts in the [REF] Title / Requirement / Rationale / Fit Criteria layout the parser expects
+    rnd = random.Random(seed)
+    names = [THEME_WORDS[i] if i < len(THEME_WORDS) else f'theme {i}' for i in range(max(1, themes))]
+    yield 'Requirements Specification'
+    for i in range(requirements):
+        yield f'[SYN-{1000 + i}] Synthetic capability {i}'
+        yield 'Requirement'
+        yield f'As a {rnd.choice(ACTORS)} I want capability {i} so that work item {i} can be completed'
+        yield 'Rationale'
+        yield f'Capability {i} reduces manual effort for {rnd.choice(names)}'
+        yield 'Fit Criteria'
+        for j in range(fits):
+            if rnd.random() < plain_ratio:
+                yield f'The system records outcome {j} for capability {i}'
+            else:
+                yield f'{rnd.choice(names)}: outcome {j} of capability {i} is visible within 2 seconds'
+
+def write_synthetic_docx(output, paragraphs):
+    tmpl = gb.load_docx_template()
+    output.write(tmpl['parts_zip'])
+    output.seek(0)
+    with zipfile.ZipFile(output, 'a', zipfile.ZIP_DEFLATED) as zf, zf.open(tmpl['document_part'], 'w') as fp:
+        fp.write(tmpl['head'].encode('utf-8'))
+        for text in paragraphs:
+            fp.write(gb.wml_paragraph(text).encode('utf-8'))
+        fp.write((tmpl['sect_pr'] + '</w:body></w:document>').encode('utf-8'))
+
+def synthetic_docx(requirements: int, fits: int, themes: int, plain_ratio: float = 0.2, seed: int = 0) -> bytes:
+    out = io.BytesIO()
+    write_synthetic_docx(out, synthetic_paragraphs(requirements, fits, themes, plain_ratio, seed))
+    return out.getvalue()
+
+def reset_caches():
+    gb.PARSE_CACHE.clear()
+    gb.RENDER_CACHE.clear()
+
+def stage_runner(stage: str, blob: bytes, mode: str):
+    # returns a callable timing exactly one stage; caches are reset so every run does the full work for that stage
+    data = gb.load_requirements(blob)
+    if stage == 'parse':
+        def run():
+            gb.parse_docx(io.BytesIO(blob))
+    elif stage == 'overview':
+        def run():
+            plans = gb.build_plans(data, mode)
+            gb.compute_overview(data, mode, plans)
+            gb.compute_overview_totals(data, mode, plans)
+            gb.build_traceability(data, mode, top_n=0, plans=plans)
+    elif stage == 'render_docx':
+        def run():
+            gb.RENDER_CACHE.clear()
+            gb.generate_gherkin_document(blob, io.BytesIO(), mode=mode)
+    else:
+        def run():
+            gb.RENDER_CACHE.clear()
+            gb.generate_playwright_ts(blob, io.BytesIO(), mode=mode)
+    return run
+
+def measure(run, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': min(times), 'median': statistics.median(times), 'peakKiB': peak // 1024}
+
+def run_suite(sizes, fits: int, themes: int, plain_ratio: float, repeat: int, modes=MODES, stages=STAGES, seed: int = 0, log=None):
+    results = {}
+    for n in sizes:
+        blob = synthetic_docx(n, fits, themes, plain_ratio, seed)
+        for mode in modes:
+            for stage in stages:
+                if stage == 'parse' and mode != modes[0]:
+                    continue
+                reset_caches()
+                key = f'{n}/{stage}' if stage == 'parse' else f'{n}/{mode}/{stage}'
+                results[key] = measure(stage_runner(stage, blob, mode), repeat)
+                if log:
+                    r = results[key]
+                    log(f"{key:<40} {r['seconds'] * 1000:10.1f} ms  (median {r['median'] * 1000:.1f} ms)  peak {r['peakKiB']} KiB")
+    return results
+
+def compare(baseline: dict, current: dict, threshold: float, memory_threshold: float):
+    # (key, metric, baseline, current, ratio) for every shared measurement that got slower/larger beyond its threshold
+    regressions = []
+    for key, base in baseline['results'].items():
+        cur = current['results'].get(key)
+        if not cur:
+            continue
+        for metric, limit in (('seconds', threshold), ('peakKiB', memory_threshold)):
+            if base[metric] > 0:
+                ratio = cur[metric] / base[metric]
+                if ratio > 1 + limit:
+                    regressions.append((key, metric, base[metric], cur[metric], ratio))
+    return regressions
+
+def cmd_generate(args):
+    with open(args.output, 'w+b') as f:
+        write_synthetic_docx(f, synthetic_paragraphs(args.requirements, args.fits, args.themes, args.plain_ratio, args.seed))
+    print(f'wrote {args.output} ({os.path.getsize(args.output)} bytes)')
+
+def cmd_run(args):
+    sizes = [int(x) for x in args.sizes.split(',') if x]
+    modes = tuple(m for m in args.modes.split(',') if m)
+    results = run_suite(sizes, args.fits, args.themes, args.plain_ratio, args.repeat, modes=modes, seed=args.seed, log=print)
+    doc = {
+        'meta': {'createdAt': datetime.now(timezone.utc).isoformat(), 'python': platform.python_version(), 'platform': platform.platform(),
+                 'cpus': os.cpu_count(), 'parser': gb.DOCX_PARSER, 'writer': gb.DOCX_WRITER,
+                 'params': {'sizes': sizes, 'fits': args.fits, 'themes': args.themes, 'plainRatio': args.plain_ratio, 'repeat': args.repeat, 'seed': args.seed}},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+        print(f'saved {args.output}')
+
+def cmd_compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    if baseline['meta'].get('params') != current['meta'].get('params'):
+        print('warning: benchmark parameters differ between runs')
+    for key in sorted(set(baseline['results']) & set(current['results'])):
+        b, c = baseline['results'][key], current['results'][key]
+        print(f"{key:<40} {b['seconds'] * 1000:10.1f} → {c['seconds'] * 1000:10.1f} ms ({c['seconds'] / b['seconds'] - 1:+.1%})" if b['seconds'] else key)
+    regressions = compare(baseline, current, args.threshold, args.memory_threshold)
+    for key, metric, b, c, ratio in regressions:
+        print(f'REGRESSION {key} {metric}: {b:.4g} → {c:.4g} ({ratio - 1:+.1%})')
+    if not regressions:
+        print('no regressions')
+    return 1 if regressions else 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks for the Gherkin backend parse/overview/render paths.')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def add_shape(p):
+        p.add_argument('--fits', type=int, default=12, help='fit criteria per requirement')
+        p.add_argument('--themes', type=int, default=4, help='distinct fit-criteria themes')
+        p.add_argument('--plain-ratio', type=float, default=0.2, help='share of fits without a theme prefix')
+        p.add_argument('--seed', type=int, default=0)
+
+    p = sub.add_parser('generate', help='write a synthetic requirements .docx')
+    p.add_argument('--requirements', type=int, default=1000)
+    add_shape(p)
+    p.add_argument('-o', '--output', required=True)
+    p.set_defaults(func=cmd_generate)
+
+    p = sub.add_parser('run', help='time and measure peak memory of each stage in every mode')
+    p.add_argument('--sizes', default='100,1000', help='comma-separated requirement counts')
+    p.add_argument('--modes', default=','.join(MODES))
+    p.add_argument('--repeat', type=int, default=3)
+    add_shape(p)
+    p.add_argument('-o', '--output', help='write results as a JSON baseline')
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser('compare', help='flag regressions between two saved runs')
+    p.add_argument('baseline')
+    p.add_argument('current')
+    p.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown as a fraction (0.10 = 10%%)')
+    p.add_argument('--memory-threshold', type=float, default=0.20, help='allowed peak-memory growth as a fraction')
+    p.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
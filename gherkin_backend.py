@@ -1,20 +1,62 @@
 
-from flask import Flask, request, send_file, jsonify, make_response
+from flask import Flask, Blueprint, Response, request, send_file, jsonify, make_response, stream_with_context, g, has_request_context, current_app
 from flask_cors import CORS
-from docx import Document
-import os, re, time
-from collections import defaultdict
+from werkzeug.wsgi import ClosingIterator
+from lxml import etree
+from xml.sax.saxutils import escape as xml_escape
+import os, re, io, copy, json, time, hashlib, heapq, itertools, threading, zipfile, zlib, tempfile, uuid, multiprocessing, importlib.util
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, CancelledError
+from concurrent.futures.process import BrokenProcessPool
 
-app = Flask(__name__)
+bp = Blueprint('gherkin', __name__)
 
 FRONTEND_ORIGIN = os.environ.get("FRONTEND_ORIGIN", "*")
-CORS(app, resources={r"/*": {"origins": FRONTEND_ORIGIN}})
+EXPOSED_HEADERS = ['Content-Disposition', 'X-Process-Time', 'X-Regen-Report', 'Server-Timing', 'ETag', 'X-Result-Cache', 'X-Batch-Files',
+                   'X-Batch-Errors', 'Location', 'Retry-After']
+# background (default): warm up in a thread, /readyz answers 503 until done; sync: warm up before serving; off
+WARMUP = os.environ.get('WARMUP', 'background').strip().lower()
 
-UPLOAD_FOLDER = "uploads"
 OUTPUT_FOLDER = "outputs"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+OUTPUT_SPOOL_MAX_MEMORY = int(os.environ.get('OUTPUT_SPOOL_MAX_MEMORY', str(8 * 1024 * 1024)))
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+TS_MIMETYPE = 'application/typescript'
+NDJSON_MIMETYPE = 'application/x-ndjson'
 
+DOCX_PARSER = os.environ.get('DOCX_PARSER', 'stream').strip().lower()
+DOCX_WRITER = os.environ.get('DOCX_WRITER', 'stream').strip().lower()
+PARSE_CACHE_MAX_ENTRIES = int(os.environ.get('PARSE_CACHE_MAX_ENTRIES', '64'))
+PARSE_CACHE_MAX_BYTES = int(os.environ.get('PARSE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+PARSE_CACHE_TTL = float(os.environ.get('PARSE_CACHE_TTL', '900'))
+RENDER_CACHE_MAX_ENTRIES = int(os.environ.get('RENDER_CACHE_MAX_ENTRIES', '50000'))
+RENDER_CACHE_MAX_BYTES = int(os.environ.get('RENDER_CACHE_MAX_BYTES', str(128 * 1024 * 1024)))
+RENDER_CACHE_TTL = float(os.environ.get('RENDER_CACHE_TTL', '3600'))
+REVISION_INDEX_MAX_ENTRIES = int(os.environ.get('REVISION_INDEX_MAX_ENTRIES', '256'))
+REGEN_REPORT_MAX_IDS = int(os.environ.get('REGEN_REPORT_MAX_IDS', '200'))
+PARALLEL_RENDER_WORKERS = int(os.environ.get('PARALLEL_RENDER_WORKERS', str(os.cpu_count() or 1)))
+PARALLEL_RENDER_MIN_REQS = int(os.environ.get('PARALLEL_RENDER_MIN_REQS', '500'))
+PARALLEL_RENDER_MIN_CHUNK = int(os.environ.get('PARALLEL_RENDER_MIN_CHUNK', '32'))
+PREVIEW_STREAM_MAX_TOP_N = int(os.environ.get('PREVIEW_STREAM_MAX_TOP_N', '200'))
+PREVIEW_STREAM_TOTALS_EVERY = int(os.environ.get('PREVIEW_STREAM_TOTALS_EVERY', '100'))
+TRACEABILITY_PAGE_SIZE = int(os.environ.get('TRACEABILITY_PAGE_SIZE', '100'))
+TRACEABILITY_MAX_PAGE_SIZE = int(os.environ.get('TRACEABILITY_MAX_PAGE_SIZE', '1000'))
+REVISION_DIR = os.path.join(OUTPUT_FOLDER, 'revisions')
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(OUTPUT_FOLDER, 'metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+RESULT_STORE_DIR = os.path.join(OUTPUT_FOLDER, 'results')
+RESULT_STORE_MAX_BYTES = int(os.environ.get('RESULT_STORE_MAX_BYTES', str(512 * 1024 * 1024)))
+RESULT_STORE_TMP_MAX_AGE = 3600
+RESULT_STORE_EVICT_INTERVAL = float(os.environ.get('RESULT_STORE_EVICT_INTERVAL', '30'))
+# part of every ETag; bump whenever rendering changes so stored results from older code are never served
+RESULT_STORE_VERSION = '4'
+os.makedirs(REVISION_DIR, exist_ok=True)
+os.makedirs(METRICS_DIR, exist_ok=True)
+if RESULT_STORE_MAX_BYTES > 0:
+    os.makedirs(RESULT_STORE_DIR, exist_ok=True)
+
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
 BLOCK_HEADER_RE = re.compile(r'^\[(?P<ref>[^\]]+)\]\s+(?P<title>.+)$')
 
 def digits_from_ref(refcode: str) -> str:
@@ -27,52 +69,42 @@ def norm_heading(text: str) -> str:
         t = t[:-1].strip()
     return t
 
-def para_is_heading(text: str, label: str) -> bool:
-    return norm_heading(text) == label
+FIT_HEADINGS = ('fit criteria', 'fitcriterion', 'fit-criteria', 'fit', 'acceptance criteria', 'acceptance tests')
+# normalized heading -> the section it opens; one lookup per paragraph instead of a norm_heading per label
+SECTION_HEADINGS = {'requirement': 'Requirement', 'rationale': 'Rationale', 'rational': 'Rationale', **dict.fromkeys(FIT_HEADINGS, 'Fit')}
 
-def is_fit_heading(text: str) -> bool:
-    t = norm_heading(text)
-    return t in ('fit criteria', 'fitcriterion', 'fit-criteria', 'fit', 'acceptance criteria', 'acceptance tests')
+def iter_requirements_from_texts(texts):
+    # heading/fit-criteria state machine over paragraph texts; yields each requirement as soon as its block closes
+    cur, section = None, None
 
-def parse_requirements_from_docx(path: str):
-    doc = Document(path)
-    items, cur, section = [], None, None
-
-    def commit():
-        nonlocal cur
-        if cur:
-            cur.setdefault('ReferenceCode', '')
-            cur.setdefault('ReqID', digits_from_ref(cur.get('ReferenceCode')))
-            cur.setdefault('Title', '')
-            cur.setdefault('ReqName', f"[{cur.get('ReferenceCode','')}] {cur.get('Title','')}".strip())
-            cur.setdefault('Requirement', '')
-            cur.setdefault('Rationale', '')
-            cur.setdefault('FitCriteria', [])
-            items.append(cur)
-            cur = None
-
-    for p in doc.paragraphs:
-        text = (p.text or '').strip()
+    def finish(it):
+        ref = it.get('ReferenceCode', '')
+        title = it.get('Title', '')
+        return {
+            'ReqID': digits_from_ref(ref),
+            'ReqName': f"[{ref}] {title}".strip(),
+            'Topic': title,
+            'Requirement': it.get('Requirement', ''),
+            'Rationale': it.get('Rationale', ''),
+            'FitCriteria': it.get('FitCriteria', [])
+        }
+
+    for raw in texts:
+        text = (raw or '').strip()
         if not text:
             continue
         m = BLOCK_HEADER_RE.match(text)
         if m:
-            commit()
+            if cur:
+                yield finish(cur)
             cur = {'ReferenceCode': m.group('ref').strip(), 'Title': m.group('title').strip(), 'FitCriteria': []}
             section = None
             continue
-        if para_is_heading(text, 'requirement'):
-            section = 'Requirement'
-            if cur:
-                cur.setdefault('Requirement', '')
-            continue
-        if para_is_heading(text, 'rationale') or para_is_heading(text, 'rational'):
-            section = 'Rationale'
-            if cur:
-                cur.setdefault('Rationale', '')
-            continue
-        if is_fit_heading(text):
-            section = 'Fit'
+        heading = SECTION_HEADINGS.get(norm_heading(text))
+        if heading:
+            section = heading
+            if cur and heading != 'Fit':
+                cur.setdefault(heading, '')
             continue
         if not cur:
             continue
@@ -82,17 +114,287 @@ def parse_requirements_from_docx(path: str):
             cur['Rationale'] = (cur.get('Rationale', '') + (' ' if cur.get('Rationale') else '') + text)
         elif section == 'Fit':
             cur['FitCriteria'].append(text)
-    commit()
-    return [{
-        'ReqID': it.get('ReqID'),
-        'ReqName': it.get('ReqName'),
-        'Topic': it.get('Title'),
-        'Requirement': it.get('Requirement'),
-        'Rationale': it.get('Rationale'),
-        'FitCriteria': it.get('FitCriteria', [])
-    } for it in items]
+    if cur:
+        yield finish(cur)
+
+def parse_requirements_from_docx(path):
+    from docx import Document
+    doc = Document(path)
+    return list(iter_requirements_from_texts(p.text for p in doc.paragraphs))
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY, W_P, W_R, W_HYPERLINK = W_NS + 'body', W_NS + 'p', W_NS + 'r', W_NS + 'hyperlink'
+RUN_CHAR_TAGS = {W_NS + 'tab': '\t', W_NS + 'ptab': '\t', W_NS + 'cr': '\n', W_NS + 'noBreakHyphen': '-'}
+OFFICE_DOCUMENT_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+
+def run_text(r) -> str:
+    # same translation python-docx applies in Run.text
+    out = []
+    for e in r:
+        tag = e.tag
+        if tag == W_NS + 't':
+            out.append(e.text or '')
+        elif tag == W_NS + 'br':
+            out.append('\n' if e.get(W_NS + 'type', 'textWrapping') == 'textWrapping' else '')
+        elif tag in RUN_CHAR_TAGS:
+            out.append(RUN_CHAR_TAGS[tag])
+    return ''.join(out)
+
+def paragraph_text(p) -> str:
+    out = []
+    for e in p:
+        if e.tag == W_R:
+            out.append(run_text(e))
+        elif e.tag == W_HYPERLINK:
+            out.extend(run_text(r) for r in e if r.tag == W_R)
+    return ''.join(out)
+
+def main_document_part(zf) -> str:
+    try:
+        rels = etree.fromstring(zf.read('_rels/.rels'))
+    except KeyError:
+        return 'word/document.xml'
+    for rel in rels:
+        if rel.get('Type') == OFFICE_DOCUMENT_REL:
+            return rel.get('Target', '').lstrip('/')
+    return 'word/document.xml'
+
+def iter_docx_paragraph_texts(source):
+    # texts of body-level paragraphs (what Document.paragraphs returns), without building the python-docx object tree;
+    # finished body children are cleared so memory stays flat as the document grows
+    with zipfile.ZipFile(source) as zf, zf.open(main_document_part(zf)) as fp:
+        for _, elem in etree.iterparse(fp, events=('end',), tag=W_P, resolve_entities=False, no_network=True):
+            parent = elem.getparent()
+            if parent is None or parent.tag != W_BODY:
+                continue
+            yield paragraph_text(elem)
+            elem.clear(keep_tail=True)
+            while elem.getprevious() is not None:
+                del parent[0]
+
+def parse_requirements_from_docx_stream(source):
+    return list(iter_requirements_from_texts(iter_docx_paragraph_texts(source)))
+
+def parse_docx(source):
+    if DOCX_PARSER == 'python-docx':
+        return parse_requirements_from_docx(source)
+    return parse_requirements_from_docx_stream(source)
+
+class BoundedLRUCache:
+    # LRU keyed by content hash; bounded by entry count and estimated bytes, entries expire after ttl seconds (0 = never)
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and self.ttl > 0 and now - entry[2] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        # membership only: no recency update, no hit/miss accounting
+        with self._lock:
+            return key in self._items
+
+    def put(self, key, value, size: int):
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._items)))
+                self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._items.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self._bytes, 'maxEntries': self.max_entries, 'maxBytes': self.max_bytes,
+                    'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+PARSE_CACHE = BoundedLRUCache(PARSE_CACHE_MAX_ENTRIES, PARSE_CACHE_MAX_BYTES, PARSE_CACHE_TTL)
+RENDER_CACHE = BoundedLRUCache(RENDER_CACHE_MAX_ENTRIES, RENDER_CACHE_MAX_BYTES, RENDER_CACHE_TTL)
+
+def read_docx_bytes(source) -> bytes:
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if hasattr(source, 'read'):
+        return source.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+def docx_digest(blob: bytes) -> str:
+    return hashlib.sha256(blob).hexdigest()
+
+def requirement_nbytes(r: dict) -> int:
+    # rough in-memory footprint of a parsed requirement, used for the cache byte budget
+    return (256 + sum(len(r.get(k) or '') for k in ('ReqID', 'ReqName', 'Topic', 'Requirement', 'Rationale'))
+            + sum(64 + len(f) for f in r.get('FitCriteria') or []))
+
+def requirements_nbytes(data) -> int:
+    return sum(map(requirement_nbytes, data))
+
+def iter_requirements(source):
+    # parse through the content-addressed cache, yielding each requirement as soon as it is available; callers get
+    # fresh copies so the cached list is never mutated, and a streamed parse is cached once fully consumed
+    blob = read_docx_bytes(source)
+    key = docx_digest(blob)
+    data = PARSE_CACHE.get(key)
+    if data is None and DOCX_PARSER == 'python-docx':
+        data = parse_requirements_from_docx(io.BytesIO(blob))
+        PARSE_CACHE.put(key, data, requirements_nbytes(data))
+    if data is not None:
+        for r in data:
+            yield dict(r, FitCriteria=list(r.get('FitCriteria') or []))
+        return
+    # collecting for the cache stops once the list could no longer fit it, so a streamed parse of a huge document
+    # holds one requirement at a time
+    collected, size = [], 0
+    for r in iter_requirements_from_texts(iter_docx_paragraph_texts(io.BytesIO(blob))):
+        if collected is not None:
+            size += requirement_nbytes(r)
+            if size > PARSE_CACHE_MAX_BYTES:
+                collected = None
+            else:
+                collected.append(r)
+        yield dict(r, FitCriteria=list(r['FitCriteria']))
+    if collected is not None:
+        PARSE_CACHE.put(key, collected, size)
+
+def load_requirements(source):
+    return list(iter_requirements(source))
+
+def content_fingerprint(r: dict) -> str:
+    # everything a rendered block depends on besides mode and flags
+    payload = json.dumps([r.get(k) for k in ('ReqID', 'ReqName', 'Topic', 'Requirement', 'Rationale', 'FitCriteria')], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def flags_key(flags) -> str:
+    return ','.join(sorted(k for k, v in (flags or {}).items() if v))
+
+def requirement_keys(data) -> list:
+    # ReqIDs made unique by occurrence so repeated or UNKNOWN ids still diff positionally
+    seen, keys = defaultdict(int), []
+    for r in data:
+        rid = str(r.get('ReqID') or 'UNKNOWN')
+        seen[rid] += 1
+        keys.append(rid if seen[rid] == 1 else f'{rid}#{seen[rid]}')
+    return keys
+
+# the revision index is shared by all gunicorn workers: one JSON file of {requirement key: fingerprint} per
+# (kind, doc_key) under outputs/revisions, least recently written dropped beyond REVISION_INDEX_MAX_ENTRIES
+revision_saves = 0
+
+def revision_path(kind: str, doc_key: str) -> str:
+    return os.path.join(REVISION_DIR, hashlib.sha256(f'{kind}\0{doc_key}'.encode('utf-8')).hexdigest() + '.json')
+
+def load_revision(kind: str, doc_key: str) -> dict:
+    try:
+        with open(revision_path(kind, doc_key), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_revision(kind: str, doc_key: str, current: dict):
+    global revision_saves
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=REVISION_DIR)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(current, f, separators=(',', ':'))
+    os.replace(tmp, revision_path(kind, doc_key))
+    revision_saves += 1
+    # the directory scan is amortized over a sixteenth of the budget's worth of saves
+    if revision_saves >= max(1, REVISION_INDEX_MAX_ENTRIES // 16):
+        revision_saves = 0
+        evict_revisions()
+
+def evict_revisions():
+    entries = []
+    for entry in os.scandir(REVISION_DIR):
+        try:
+            entries.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            pass
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - REVISION_INDEX_MAX_ENTRIES)]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+def revision_stats() -> dict:
+    return {'entries': sum(1 for e in os.scandir(REVISION_DIR) if not e.name.startswith('.tmp-')), 'maxEntries': REVISION_INDEX_MAX_ENTRIES}
+
+def revision_diff(kind: str, doc_key, data, fingerprints) -> dict:
+    # compares against the previous revision rendered for the same explicit document key, then records this one;
+    # without a key there is nothing to compare against and everything counts as added
+    current = dict(zip(requirement_keys(data), fingerprints))
+    previous = {}
+    if doc_key:
+        previous = load_revision(kind, doc_key)
+        save_revision(kind, doc_key, current)
+    return {
+        'added': [k for k in current if k not in previous],
+        'changed': [k for k, fp in current.items() if k in previous and previous[k] != fp],
+        'removed': [k for k in previous if k not in current],
+    }
+
+def regen_report_header(report: dict) -> str:
+    out = {}
+    for k in ('added', 'changed', 'removed'):
+        ids = report.get(k) or []
+        out[k] = ids[:REGEN_REPORT_MAX_IDS]
+        out[k + 'Count'] = len(ids)
+    out['cacheHits'] = report.get('cacheHits', 0)
+    out['cacheMisses'] = report.get('cacheMisses', 0)
+    return json.dumps(out, separators=(',', ':'))
+
+def render_key(kind: str, r: dict, mode: str, flags, fingerprint=None):
+    return (kind, mode, flags_key(flags), fingerprint or content_fingerprint(r))
+
+def cached_render(kind: str, r: dict, mode: str, flags, render, fingerprint=None, stats=None):
+    # per-requirement render cache keyed by content fingerprint, mode and flags
+    key = render_key(kind, r, mode, flags, fingerprint)
+    out = RENDER_CACHE.get(key)
+    if out is None:
+        out = render()
+        RENDER_CACHE.put(key, out, 64 + (len(out) if isinstance(out, str) else sum(len(x) + 56 for x in out)))
+        if stats is not None:
+            stats['cacheMisses'] += 1
+    elif stats is not None:
+        stats['cacheHits'] += 1
+    return out
 
 THEME_SPLIT_RE = re.compile(r'\s*[:\-–—>→]\s*')
+THEME_BULLET_RE = re.compile(r'^[\-\*•]+\s*')
+TS_STRIP_RE = re.compile(r'[^\w\s\-]')
+WHITESPACE_RE = re.compile(r'\s+')
+TESTID_RE = re.compile(r'[^A-Za-z0-9]+')
 
 def extract_theme(line: str):
     s = (line or '').strip()
@@ -101,7 +403,7 @@ def extract_theme(line: str):
     parts = THEME_SPLIT_RE.split(s, maxsplit=1)
     if len(parts) > 1:
         theme = parts[0].strip().lower()
-        theme = re.sub(r'^[\-\*•]+\s*', '', theme)
+        theme = THEME_BULLET_RE.sub('', theme)
         return theme or None
     return None
 
@@ -112,20 +414,23 @@ def group_fits_by_theme(fits):
         groups[theme].append(line)
     return dict(groups)
 
-def scenario_count_by_mode(fits, mode: str) -> int:
+def scenario_count_for(n: int, groups, mode: str) -> int:
+    # groups may be a callable so the theme grouping is only computed when the count depends on it
     if mode == 'atomized':
-        return len(fits or [])
+        return n
     if mode == 'ultra-optimized':
         return 1
-    n = len(fits or [])
-    themes = group_fits_by_theme(fits)
-    multiple_topics = len(themes.keys()) > 1
     if n <= 3:
         return 1
-    if 4 <= n <= 10 and not multiple_topics:
-        return 2
+    if 4 <= n <= 10:
+        themes = groups() if callable(groups) else groups
+        if len(themes) <= 1:
+            return 2
     return 3
 
+def scenario_count_by_mode(fits, mode: str) -> int:
+    return scenario_count_for(len(fits or []), lambda: group_fits_by_theme(fits), mode)
+
 def actor_from_text(requirement_text: str, flags) -> str:
     if flags.get('opt_strict_actor'):
         m = re.search(r'As a[n]?\s+([A-Za-z0-9 _/\-]+)', requirement_text or '', re.IGNORECASE)
@@ -141,11 +446,10 @@ def distribute_into_buckets(items, k: int):
         buckets[i % k].append(it)
     return buckets
 
-def themed_buckets(fits, k: int):
-    groups = group_fits_by_theme(fits)
+def buckets_from_groups(fits, groups, k: int):
     sorted_groups = sorted(groups.items(), key=lambda x: len(x[1]), reverse=True)
     if len(sorted_groups) >= k:
-        picks = [list(x) for x in sorted_groups[:k]]
+        picks = [[name, list(lines)] for name, lines in sorted_groups[:k]]
         leftovers = [ln for _, ls in sorted_groups[k:] for ln in ls]
         for i, ln in enumerate(leftovers):
             picks[i % k][1].append(ln)
@@ -153,18 +457,69 @@ def themed_buckets(fits, k: int):
     rr = distribute_into_buckets(fits, k)
     return [(f'group {i+1}', rr[i]) for i in range(k)]
 
-def compute_overview(data, mode):
+def themed_buckets(fits, k: int):
+    return buckets_from_groups(fits, group_fits_by_theme(fits), k)
+
+class ScenarioPlan:
+    # grouping decisions for one (requirement, mode): theme groups, scenario count, buckets and actor are computed
+    # at most once and shared by the overview, traceability and both renderers
+    __slots__ = ('fits', 'mode', 'scenario_count', 'actor', 'groups_cache', 'buckets_cache', 'bucket_groups_cache')
+
+    def __init__(self, r: dict, mode: str, flags=None):
+        self.fits = r.get('FitCriteria') or []
+        self.mode = mode
+        self.groups_cache = None
+        self.buckets_cache = None
+        self.bucket_groups_cache = None
+        self.scenario_count = scenario_count_for(len(self.fits), lambda: self.groups, mode)
+        self.actor = actor_from_text(r.get('Requirement', ''), flags or {})
+
+    @property
+    def groups(self):
+        if self.groups_cache is None:
+            self.groups_cache = group_fits_by_theme(self.fits)
+        return self.groups_cache
+
+    @property
+    def buckets(self):
+        if self.buckets_cache is None:
+            self.buckets_cache = buckets_from_groups(self.fits, self.groups, self.scenario_count)
+        return self.buckets_cache
+
+    @property
+    def bucket_groups(self):
+        # regroup each bucket by the themes already extracted for self.groups instead of re-parsing every line
+        if self.bucket_groups_cache is None:
+            theme_of = {line: th for th, lines in self.groups.items() for line in lines}
+            out = []
+            for _, lines in self.buckets:
+                groups = defaultdict(list)
+                for line in lines:
+                    groups[theme_of[line]].append(line)
+                out.append(dict(groups))
+            self.bucket_groups_cache = out
+        return self.bucket_groups_cache
+
+def build_plans(data, mode: str, flags=None):
+    return [ScenarioPlan(r, mode, flags) for r in data or []]
+
+def compute_overview(data, mode, plans=None):
+    plans = plans or build_plans(data, mode)
     out = []
-    for r in data:
-        fits = r.get('FitCriteria') or []
-        out.append({'ReqID': r.get('ReqID'), 'ReqName': r.get('ReqName'), 'FitCount': len(fits), 'ScenarioCount': scenario_count_by_mode(fits, mode)})
+    for r, plan in zip(data, plans):
+        out.append({'ReqID': r.get('ReqID'), 'ReqName': r.get('ReqName'), 'FitCount': len(plan.fits), 'ScenarioCount': plan.scenario_count})
     return out
 
-def compute_overview_totals(data, mode):
+def compute_overview_totals(data, mode, plans=None, flags=None):
+    plans = plans or build_plans(data, mode)
     total_requirements = len(data or [])
-    total_fits = sum(len(r.get('FitCriteria') or []) for r in data or [])
-    total_scenarios = sum(scenario_count_by_mode(r.get('FitCriteria') or [], mode) for r in data or [])
-    return {'totalRequirements': total_requirements, 'totalFitCriteria': total_fits, 'totalScenarios': total_scenarios}
+    total_fits = sum(len(p.fits) for p in plans)
+    total_scenarios = sum(p.scenario_count for p in plans)
+    totals = {'totalRequirements': total_requirements, 'totalFitCriteria': total_fits, 'totalScenarios': total_scenarios}
+    if (flags or {}).get('opt_outline'):
+        counts = [outline_counts(r, mode, plan) for r, plan in zip(data or [], plans)]
+        totals['outline'] = outline_totals([sum(c) for c in zip(*counts)] if counts else (0, 0, 0, 0))
+    return totals
 
 def build_rules(mode, flags):
     rules = []
@@ -180,137 +535,501 @@ def build_rules(mode, flags):
     rules.extend(['Gherkin v46 style; third-person actors; no OR in steps; no UI implementation details', 'Given the user is logged in (unless an explicit different actor is detected)'])
     return rules
 
-def build_traceability(data, mode: str, top_n: int = 20):
-    ranked = sorted(data, key=lambda r: len(r.get('FitCriteria') or []), reverse=True)
+def rank_for_traceability(data, plans, top_n: int):
+    # requirements with the most fit criteria first, ties in document order
+    pairs = zip(data, plans)
     if top_n and top_n > 0:
-        ranked = ranked[:top_n]
-    nodes, links, seen = [], [], set()
-    def add_node(name, type_, label=None):
-        if name in seen:
-            return
-        nodes.append({'name': name, 'type': type_, 'label': label or name})
-        seen.add(name)
-    for r in ranked:
+        return heapq.nlargest(top_n, pairs, key=lambda rp: len(rp[1].fits))
+    return sorted(pairs, key=lambda rp: len(rp[1].fits), reverse=True)
+
+def traceability_graph(ranked):
+    # nodes are interned to integer indices in first-seen order; repeated (source, target) links are merged, values summed
+    nodes, index, links = [], {}, {}
+    def node(name, type_, label=None):
+        i = index.get(name)
+        if i is None:
+            i = index[name] = len(nodes)
+            nodes.append({'name': name, 'type': type_, 'label': label or name})
+        return i
+    def link(source, target, value):
+        links[source, target] = links.get((source, target), 0) + value
+    for r, plan in ranked:
         req_id = r.get('ReqID', 'UNKNOWN')
         topic = (r.get('Topic') or r.get('ReqName') or '').strip() or req_id
-        fits = r.get('FitCriteria') or []
-        req_node = f'REQ:{req_id}'
-        add_node(req_node, 'req', label=topic)
-        k = scenario_count_by_mode(fits, mode)
-        if k == 1:
-            sc_name = f'SC:{req_id}:1'
-            add_node(sc_name, 'sc', label=f'{req_id} — SC1')
-            links.append({'source': req_node, 'target': sc_name, 'value': max(1, len(fits))})
-            themes = group_fits_by_theme(fits)
-            for th, items in themes.items():
-                theme_node = f'TH:{th}'
-                add_node(theme_node, 'theme', label=th)
-                links.append({'source': sc_name, 'target': theme_node, 'value': max(1, len(items))})
+        fits = plan.fits
+        req_node = node(f'REQ:{req_id}', 'req', label=topic)
+        if plan.scenario_count == 1:
+            sc_node = node(f'SC:{req_id}:1', 'sc', label=f'{req_id} — SC1')
+            link(req_node, sc_node, max(1, len(fits)))
+            for th, items in plan.groups.items():
+                link(sc_node, node(f'TH:{th}', 'theme', label=th), max(1, len(items)))
         else:
-            buckets = themed_buckets(fits, k)
-            for idx, (name, group) in enumerate(buckets, 1):
-                sc_name = f'SC:{req_id}:{idx}'
+            for idx, ((name, group), themes) in enumerate(zip(plan.buckets, plan.bucket_groups), 1):
                 label = name if name and name != 'misc' else f'Group {idx}'
-                add_node(sc_name, 'sc', label=f'{req_id} — {label}')
-                links.append({'source': req_node, 'target': sc_name, 'value': max(1, len(group))})
-                themes = group_fits_by_theme(group)
+                sc_node = node(f'SC:{req_id}:{idx}', 'sc', label=f'{req_id} — {label}')
+                link(req_node, sc_node, max(1, len(group)))
                 for th, items in themes.items():
-                    theme_node = f'TH:{th}'
-                    add_node(theme_node, 'theme', label=th)
-                    links.append({'source': sc_name, 'target': theme_node, 'value': max(1, len(items))})
+                    link(sc_node, node(f'TH:{th}', 'theme', label=th), max(1, len(items)))
+    return nodes, [{'source': s, 'target': t, 'value': v} for (s, t), v in links.items()]
+
+def named_traceability(ranked, top_n: int):
+    nodes, links = traceability_graph(ranked)
+    # /preview keeps node names as link endpoints; /traceability serves the indexed form
+    for l in links:
+        l['source'] = nodes[l['source']]['name']
+        l['target'] = nodes[l['target']]['name']
     return {'nodes': nodes, 'links': links, 'meta': {'topN': top_n, 'reqs': len(ranked)}}
 
+def build_traceability(data, mode: str, top_n: int = 20, plans=None):
+    plans = plans or build_plans(data, mode)
+    return named_traceability(rank_for_traceability(data, plans, top_n), top_n)
+
+def iter_preview_records(requirements, mode: str, flags, guidelines: str, top_n: int, digest=None):
+    # streamed /preview: a record per requirement with its overview row, periodic running totals, then rules and the
+    # traceability summary; only the top_n heap (same ranking as rank_for_traceability) outlives each requirement
+    t0 = time.perf_counter()
+    yield {'type': 'start', 'mode': mode, 'topN': top_n, 'guidelines': guidelines, 'digest': digest}
+    heap, totals = [], {'totalRequirements': 0, 'totalFitCriteria': 0, 'totalScenarios': 0}
+    outline = [0, 0, 0, 0] if flags.get('opt_outline') else None
+    for i, r in enumerate(requirements):
+        with timed('plan'):
+            plan = ScenarioPlan(r, mode, flags)
+            n_fits = len(plan.fits)
+            totals['totalRequirements'] += 1
+            totals['totalFitCriteria'] += n_fits
+            totals['totalScenarios'] += plan.scenario_count
+            if outline is not None:
+                outline[:] = map(sum, zip(outline, outline_counts(r, mode, plan)))
+            # (fit count, -position) is unique, so ties keep the earlier requirement and r/plan are never compared
+            if len(heap) < top_n:
+                heapq.heappush(heap, (n_fits, -i, r, plan))
+            elif (n_fits, -i) > heap[0][:2]:
+                heapq.heapreplace(heap, (n_fits, -i, r, plan))
+        count_document(1, n_fits, plan.scenario_count)
+        row = {'ReqID': r.get('ReqID'), 'ReqName': r.get('ReqName'), 'FitCount': n_fits, 'ScenarioCount': plan.scenario_count}
+        yield {'type': 'requirement', 'index': i, 'data': r, 'overview': row}
+        if (i + 1) % PREVIEW_STREAM_TOTALS_EVERY == 0:
+            if outline is not None:
+                totals['outline'] = outline_totals(outline)
+            yield {'type': 'totals', 'overviewTotals': dict(totals), 'final': False}
+    if outline is not None:
+        totals['outline'] = outline_totals(outline)
+    yield {'type': 'totals', 'overviewTotals': totals, 'final': True}
+    yield {'type': 'rules', 'rules': build_rules(mode, flags)}
+    with timed('plan'):
+        ranked = [(r, plan) for _, _, r, plan in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+        trace = named_traceability(ranked, top_n)
+    yield {'type': 'traceability', 'traceability': trace}
+    yield {'type': 'end', 'time': round(time.perf_counter() - t0, 3)}
+
 def ts_identifier(s: str) -> str:
     s = (s or '').strip()
-    s = re.sub(r'[^\w\s\-]', '', s)
-    s = re.sub(r'\s+', ' ', s)
+    s = TS_STRIP_RE.sub('', s)
+    s = WHITESPACE_RE.sub(' ', s)
     return s[:80]
 
 def data_testid_from_text(s: str) -> str:
-    base = re.sub(r'[^A-Za-z0-9]+', '-', (s or '').strip().lower()).strip('-')
+    base = TESTID_RE.sub('-', (s or '').strip().lower()).strip('-')
     return base or 'element'
 
-def render_ts_block_for_requirement(r: dict, mode: str) -> str:
+def ts_tests_for_requirement(r: dict, mode: str, plan) -> list:
+    # the tests of one requirement as (name, checks) with checks = [(comment label, fit)]
     req_id = r.get('ReqID', 'UNKNOWN')
     topic = r.get('Topic', '') or r.get('ReqName', '')
-    fits = r.get('FitCriteria', []) or []
-    n_scen = scenario_count_by_mode(fits, mode)
-    lines = []
-    feature_name = ts_identifier(f'{req_id} {topic}'.strip())
-    lines.append(f"test.describe('{feature_name}', () => {{")
+    fits = plan.fits
     if mode == 'atomized' and fits:
-        for i, fit in enumerate(fits, 1):
-            scen_name = ts_identifier(f'{topic} — FIT {i}')
-            tid = data_testid_from_text(fit)
+        return [(ts_identifier(f'{topic} — FIT {i}'), [('FIT', fit)]) for i, fit in enumerate(fits, 1)]
+    if plan.scenario_count == 1:
+        return [(ts_identifier(topic or req_id), [('Then' if j == 0 else 'And', fit) for j, fit in enumerate(fits)])]
+    return [(ts_identifier(f"{topic} — {name or f'Group {idx}'}"), [('Then' if j == 0 else 'And', fit) for j, fit in enumerate(group)])
+            for idx, (name, group) in enumerate(plan.buckets, 1)]
+
+def ts_case_literal(name: str, checks, single: bool) -> str:
+    if single:
+        return f"    {{ name: '{name}', fit: {json.dumps(checks[0][1], ensure_ascii=False)}, testId: '{data_testid_from_text(checks[0][1])}' }},"
+    items = ', '.join(f"{{ fit: {json.dumps(fit, ensure_ascii=False)}, testId: '{data_testid_from_text(fit)}' }}" for _, fit in checks)
+    return f"    {{ name: '{name}', checks: [{items}] }},"
+
+def ts_outline_groups(tests) -> list:
+    # the TS side of outline_scenarios: tests with the same number of checks (the Gherkin scenarios with the same step
+    # keywords) form one group, placed where its first member was; tests without checks are never looped
+    groups = {}
+    for n, (name, checks) in enumerate(tests):
+        groups.setdefault(len(checks) or -n - 1, []).append((name, checks))
+    return list(groups.values())
+
+def render_ts_block_for_requirement(r: dict, mode: str, plan=None, outline: bool = False) -> str:
+    plan = plan or ScenarioPlan(r, mode)
+    req_id = r.get('ReqID', 'UNKNOWN')
+    topic = r.get('Topic', '') or r.get('ReqName', '')
+    tests = ts_tests_for_requirement(r, mode, plan)
+    lines = [f"test.describe('{ts_identifier(f'{req_id} {topic}'.strip())}', () => {{"]
+    loops = 0
+    for group in ts_outline_groups(tests) if outline else [[test] for test in tests]:
+        if len(group) > 1:
+            # data-driven: one test table and a loop instead of a near-identical test() per case
+            loops += 1
+            cases = 'cases' if loops == 1 else f'cases{loops}'
+            single = len(group[0][1]) == 1
+            lines.append(f'  const {cases} = [')
+            lines.extend(ts_case_literal(name, checks, single) for name, checks in group)
+            lines.append('  ];')
             lines.extend([
-                f"  test('{scen_name}', async ({{ page }}) => {{",
-                f"    await page.goto(`${{BASE_URL}}/dashboard`); // pre-auth assumed",
-                f"    // FIT: {fit}",
-                f"    await expect(page.getByTestId('{tid}')).toBeVisible();",
-                f"  }});"
+                f"  for (const {{ name, {'testId' if single else 'checks'} }} of {cases}) {{",
+                "    test(name, async ({ page }) => {",
+                "      await page.goto(`${BASE_URL}/dashboard`); // pre-auth assumed",
             ])
-    else:
-        k = n_scen
-        if k == 1:
-            scen_name = ts_identifier(topic or req_id)
+            if single:
+                lines.append("      await expect(page.getByTestId(testId)).toBeVisible();")
+            else:
+                lines.extend([
+                    "      for (const { testId } of checks) {",
+                    "        await expect(page.getByTestId(testId)).toBeVisible();",
+                    "      }",
+                ])
+            lines.extend(['    });', '  }'])
+            continue
+        for name, checks in group:
             lines.extend([
-                f"  test('{scen_name}', async ({{ page }}) => {{",
+                f"  test('{name}', async ({{ page }}) => {{",
                 f"    await page.goto(`${{BASE_URL}}/dashboard`); // pre-auth assumed",
             ])
-            if fits:
-                for j, fit in enumerate(fits):
-                    tid = data_testid_from_text(fit)
-                    prefix = 'Then' if j == 0 else 'And'
-                    lines.append(f"    // {prefix}: {fit}")
-                    lines.append(f"    await expect(page.getByTestId('{tid}')).toBeVisible();")
+            if checks:
+                for label, fit in checks:
+                    lines.append(f"    // {label}: {fit}")
+                    lines.append(f"    await expect(page.getByTestId('{data_testid_from_text(fit)}')).toBeVisible();")
             else:
                 lines.append('    // Then: it should meet the specified acceptance criteria')
             lines.append('  });')
-        else:
-            buckets = themed_buckets(fits, k)
-            for idx, (name, group) in enumerate(buckets, 1):
-                scen_name = ts_identifier(f"{topic} — {name or f'Group {idx}'}")
-                lines.extend([
-                    f"  test('{scen_name}', async ({{ page }}) => {{",
-                    f"    await page.goto(`${{BASE_URL}}/dashboard`); // pre-auth assumed",
-                ])
-                if group:
-                    for j, fit in enumerate(group):
-                        tid = data_testid_from_text(fit)
-                        prefix = 'Then' if j == 0 else 'And'
-                        lines.append(f"    // {prefix}: {fit}")
-                        lines.append(f"    await expect(page.getByTestId('{tid}')).toBeVisible();")
-                else:
-                    lines.append('    // Then: it should meet the specified acceptance criteria')
-                lines.append('  });')
     lines.append('});')
     return '\n'.join(lines)
 
-def generate_playwright_ts(input_path: str, output_ts_path: str, mode: str = 'optimized'):
-    data = parse_requirements_from_docx(input_path)
-    chunks = [
-        '// Auto-generated by Gherkin Intelligence Engine',
-        "import { test, expect } from '@playwright/test';",
-        '',
-        "const BASE_URL = process.env.BASE_URL ?? 'https://your-app.example.com';",
-        ''
-    ]
-    for r in data:
-        chunks.append(render_ts_block_for_requirement(r, mode))
-        chunks.append('')
-    ts_code = '\n'.join(chunks)
-    with open(output_ts_path, 'w', encoding='utf-8') as f:
-        f.write(ts_code)
+TS_HEADER = '\n'.join([
+    '// Auto-generated by Gherkin Intelligence Engine',
+    "import { test, expect } from '@playwright/test';",
+    '',
+    "const BASE_URL = process.env.BASE_URL ?? 'https://your-app.example.com';",
+    ''
+])
+
+def iter_playwright_ts(requirements, mode: str = 'optimized', progress=None, total: int = 0, flags=None, fingerprints=None, stats=None, parallel=False):
+    # the .spec.ts as text pieces: the header, then one test.describe block per requirement; with parallel=True
+    # (requirements must be a list) render-cache misses of large documents are rendered in the render pool
+    pre = parallel_renders('ts', requirements, mode, flags, fingerprints) if parallel else None
+    outline = bool((flags or {}).get('opt_outline'))
+    yield TS_HEADER
+    for i, r in enumerate(requirements, 1):
+        fp = fingerprints[i - 1] if fingerprints else None
+        plan = ScenarioPlan(r, mode)
+        block = cached_render('ts', r, mode, flags, lambda: pre and pre.pop(i - 1) or render_ts_block_for_requirement(r, mode, plan, outline), fp, stats)
+        count_document(1, len(plan.fits), plan.scenario_count)
+        yield '\n' + block + '\n'
+        if progress:
+            progress(i, total)
+
+def coalesce_chunks(pieces, size: int = 1 << 14):
+    buf, n = [], 0
+    for piece in pieces:
+        buf.append(piece)
+        n += len(piece)
+        if n >= size:
+            yield ''.join(buf).encode('utf-8')
+            buf, n = [], 0
+    if buf:
+        yield ''.join(buf).encode('utf-8')
+
+def generate_playwright_ts(input_path, output_ts_path, mode: str = 'optimized', progress=None, flags=None, doc_key=None, report=None):
+    with timed('parse'):
+        data = load_requirements(input_path)
+    with timed('plan'):
+        fps = [content_fingerprint(r) for r in data]
+    stats = {'cacheHits': 0, 'cacheMisses': 0}
+    blocks = timed_iter(iter_playwright_ts(data, mode, progress=progress, total=len(data), flags=flags, fingerprints=fps, stats=stats, parallel=True), 'render')
+    with timed('serialize'):
+        chunks = coalesce_chunks(blocks, size=1 << 16)
+        if hasattr(output_ts_path, 'write'):
+            for chunk in chunks:
+                output_ts_path.write(chunk)
+        else:
+            with open(output_ts_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+    if report is not None:
+        report.update(revision_diff('playwright', doc_key, data, fps))
+        report.update(stats)
     return True
 
-@app.route('/', methods=['GET'])
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TIMED_STAGES = ('receive', 'parse', 'plan', 'render', 'serialize', 'send')
+
+class StageClock:
+    # exclusive wall time per stage: entering a nested stage pauses the enclosing one, so interleaved generators
+    # (parse inside render inside serialize) are each charged only for their own work
+    __slots__ = ('totals', 'stack', 'last', 'started')
+
+    def __init__(self):
+        self.totals = defaultdict(float)
+        self.stack = []
+        self.started = self.last = time.perf_counter()
+
+    def enter(self, stage: str):
+        now = time.perf_counter()
+        if self.stack:
+            self.totals[self.stack[-1]] += now - self.last
+        self.stack.append(stage)
+        self.last = now
+
+    def exit(self):
+        now = time.perf_counter()
+        self.totals[self.stack.pop()] += now - self.last
+        self.last = now
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames, buckets=METRIC_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value: float):
+        with self.lock:
+            counts = self.series.get(labels)
+            if counts is None:
+                counts = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, le in enumerate(self.buckets):
+                if value <= le:
+                    counts[0][i] += 1
+            counts[1] += value
+            counts[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(labels), [list(buckets), total, count]] for labels, (buckets, total, count) in self.series.items()]
+
+    @staticmethod
+    def merge(merged: dict, items):
+        for labels, (buckets, total, count) in items:
+            cur = merged.setdefault(tuple(labels), [[0] * len(buckets), 0.0, 0])
+            cur[0] = [a + b for a, b in zip(cur[0], buckets)]
+            cur[1] += total
+            cur[2] += count
+
+    def render(self, series: dict):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (buckets, total, count) in sorted(series.items()):
+            base = ','.join(f'{k}="{v}"' for k, v in zip(self.labelnames, labels))
+            for le, n in zip(self.buckets, buckets):
+                lines.append(f'{self.name}_bucket{{{base},le="{le}"}} {n}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.series = defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, labels, value: float = 1):
+        with self.lock:
+            self.series[labels] += value
+
+    def snapshot(self):
+        with self.lock:
+            return [[list(labels), value] for labels, value in self.series.items()]
+
+    @staticmethod
+    def merge(merged: dict, items):
+        for labels, value in items:
+            merged[tuple(labels)] = merged.get(tuple(labels), 0) + value
+
+    def render(self, series: dict):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(series.items()):
+            base = ','.join(f'{k}="{v}"' for k, v in zip(self.labelnames, labels))
+            lines.append(f'{self.name}{{{base}}} {value:g}')
+        return lines
+
+STAGE_SECONDS = Histogram('gherkin_stage_seconds', 'Exclusive time spent per request stage.', ('endpoint', 'stage'))
+REQUEST_SECONDS = Histogram('gherkin_request_seconds', 'Wall time from request start to response close.', ('endpoint',))
+REQUESTS_TOTAL = Counter('gherkin_requests_total', 'Requests served.', ('endpoint', 'status'))
+DOC_REQUIREMENTS_TOTAL = Counter('gherkin_document_requirements_total', 'Requirements processed.', ('endpoint',))
+DOC_FITS_TOTAL = Counter('gherkin_document_fit_criteria_total', 'Fit criteria processed.', ('endpoint',))
+DOC_SCENARIOS_TOTAL = Counter('gherkin_document_scenarios_total', 'Scenarios planned.', ('endpoint',))
+METRICS = (STAGE_SECONDS, REQUEST_SECONDS, REQUESTS_TOTAL, DOC_REQUIREMENTS_TOTAL, DOC_FITS_TOTAL, DOC_SCENARIOS_TOTAL)
+
+# every process keeps its own series and snapshots them to METRICS_DIR/<pid>-<id>.json (at most every
+# METRICS_FLUSH_INTERVAL seconds, from a background thread); /metrics merges the snapshots of all processes, so any
+# gunicorn worker answers for the whole server. Files of exited workers stay, so counters never go backwards
+metrics_file = None
+metrics_pid = None
+metrics_dirty = threading.Event()
+metrics_flush_lock = threading.Lock()
+
+def flush_metrics():
+    global metrics_file, metrics_pid
+    with metrics_flush_lock:
+        if metrics_pid != os.getpid():
+            metrics_pid = os.getpid()
+            metrics_file = os.path.join(METRICS_DIR, f'{metrics_pid}-{uuid.uuid4().hex[:8]}.json')
+        snapshot = {m.name: m.snapshot() for m in METRICS}
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=METRICS_DIR)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp, metrics_file)
+
+def metrics_flusher():
+    while True:
+        metrics_dirty.wait()
+        metrics_dirty.clear()
+        try:
+            flush_metrics()
+        except OSError:
+            pass
+        time.sleep(METRICS_FLUSH_INTERVAL)
+
+metrics_flusher_pid = None
+
+def metrics_changed():
+    global metrics_flusher_pid
+    metrics_dirty.set()
+    if metrics_flusher_pid != os.getpid():
+        with metrics_flush_lock:
+            if metrics_flusher_pid != os.getpid():
+                metrics_flusher_pid = os.getpid()
+                threading.Thread(target=metrics_flusher, name='metrics-flush', daemon=True).start()
+
+def merged_metrics() -> list:
+    merged = {m.name: {} for m in METRICS}
+    for entry in os.scandir(METRICS_DIR):
+        if entry.name.startswith('.tmp-') or not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for m in METRICS:
+            m.merge(merged[m.name], snapshot.get(m.name, []))
+    lines = []
+    for m in METRICS:
+        lines.extend(m.render(merged[m.name]))
+    return lines
+
+def clear_metrics():
+    # called by the gunicorn master before workers start, so a restart begins from zero
+    for entry in os.scandir(METRICS_DIR):
+        try:
+            os.unlink(entry.path)
+        except OSError:
+            pass
+
+def stage_clock():
+    if not has_request_context():
+        return None
+    return g.get('stage_clock')
+
+@contextmanager
+def timed(stage: str):
+    clock = stage_clock()
+    if clock is None:
+        yield
+        return
+    clock.enter(stage)
+    try:
+        yield
+    finally:
+        clock.exit()
+
+def timed_iter(items, stage: str):
+    # charges the time spent producing each item to stage
+    clock = stage_clock()
+    if clock is None:
+        yield from items
+        return
+    it = iter(items)
+    while True:
+        clock.enter(stage)
+        try:
+            item = next(it)
+        except StopIteration:
+            return
+        finally:
+            clock.exit()
+        yield item
+
+def count_document(requirements: int, fits: int, scenarios: int):
+    if has_request_context() and 'doc_sizes' in g:
+        sizes = g.doc_sizes
+        sizes[0] += requirements
+        sizes[1] += fits
+        sizes[2] += scenarios
+
+def count_plans(plans):
+    count_document(len(plans), sum(len(p.fits) for p in plans), sum(p.scenario_count for p in plans))
+
+@bp.before_app_request
+def start_stage_clock():
+    g.stage_clock = StageClock()
+    g.doc_sizes = [0, 0, 0]
+
+@bp.after_app_request
+def emit_server_timing(response):
+    clock = g.get('stage_clock')
+    endpoint = request.url_rule.rule if request.url_rule else ''
+    if clock is None or endpoint in ('', '/metrics'):
+        return response
+    timings = [f'{stage};dur={clock.totals[stage] * 1000:.1f}' for stage in TIMED_STAGES if stage in clock.totals]
+    timings.append(f'total;dur={(time.perf_counter() - clock.started) * 1000:.1f}')
+    response.headers['Server-Timing'] = ', '.join(timings)
+    response.headers['Timing-Allow-Origin'] = FRONTEND_ORIGIN
+    # everything after this point that is not a nested stage (streamed bodies run parse/render inside it) is send time
+    clock.enter('send')
+    status, sizes = str(response.status_code), g.doc_sizes
+
+    def record():
+        if clock.stack:
+            clock.exit()
+        for stage, seconds in clock.totals.items():
+            STAGE_SECONDS.observe((endpoint, stage), seconds)
+        REQUEST_SECONDS.observe((endpoint,), time.perf_counter() - clock.started)
+        REQUESTS_TOTAL.inc((endpoint, status))
+        if sizes[0]:
+            DOC_REQUIREMENTS_TOTAL.inc((endpoint,), sizes[0])
+            DOC_FITS_TOTAL.inc((endpoint,), sizes[1])
+            DOC_SCENARIOS_TOTAL.inc((endpoint,), sizes[2])
+        metrics_changed()
+    if response.direct_passthrough:
+        # send_file bodies are handed to the server as-is and Response.close is never called; hook the body's close
+        response.response = ClosingIterator(response.response, record)
+    else:
+        response.call_on_close(record)
+    return response
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    if any(m.series for m in METRICS):
+        flush_metrics()  # this worker's own series as of now
+    lines = merged_metrics()
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+@bp.route('/', methods=['GET'])
 def root():
     return jsonify({'service': 'gherkin-backend', 'status': 'ok'}), 200
 
-@app.route('/healthz', methods=['GET'])
+@bp.route('/healthz', methods=['GET'])
 def healthz():
     return jsonify({'ok': True}), 200
 
+@bp.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify({'parse': PARSE_CACHE.stats(), 'render': RENDER_CACHE.stats(), 'revisions': revision_stats(), 'results': result_store_stats()}), 200
+
 def get_mode_flags_guidelines(form):
     mode = (form.get('mode') or 'optimized').strip().lower()
     if mode not in ('ultra-optimized', 'optimized', 'atomized'):
@@ -323,155 +1042,1380 @@ def get_mode_flags_guidelines(form):
     guidelines = (form.get('guidelines') or '').strip()
     return mode, flags, guidelines
 
-@app.route('/preview', methods=['POST'])
-def preview():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    file = request.files['file']
-    if file.filename == '' or not file.filename.lower().endswith('.docx'):
-        return jsonify({'error': 'Invalid file (.docx expected)'}), 400
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-    mode, flags, guidelines = get_mode_flags_guidelines(request.form)
+def form_int(name: str, default: int) -> int:
     try:
-        top_n = int((request.form.get('topN') or '20').strip())
+        return int((request.form.get(name) or str(default)).strip())
     except Exception:
-        top_n = 20
+        return default
+
+def read_docx_upload():
+    # the upload is parsed from memory; nothing is written under the client's filename
+    with timed('receive'):
+        if 'file' not in request.files:
+            return None, (jsonify({'error': 'No file part'}), 400)
+        file = request.files['file']
+        if file.filename == '' or not file.filename.lower().endswith('.docx'):
+            return None, (jsonify({'error': 'Invalid file (.docx expected)'}), 400)
+        return file.read(), None
+
+def upload_doc_key():
+    # identifies successive revisions of one spec; only an explicit doc_key counts (filenames collide across users)
+    key = (request.form.get('doc_key') or '').strip()
+    return key or None
+
+def spooled_output():
+    # per-request output buffer; spills to an anonymous temp file past OUTPUT_SPOOL_MAX_MEMORY and is removed on close
+    return tempfile.SpooledTemporaryFile(max_size=OUTPUT_SPOOL_MAX_MEMORY, prefix='gherkin-', dir=OUTPUT_FOLDER)
+
+def send_output(out, download_name: str, mimetype: str, elapsed: float):
+    out.seek(0)
+    resp = make_response(send_file(out, as_attachment=True, download_name=download_name, mimetype=mimetype))
+    resp.headers['X-Process-Time'] = str(elapsed)
+    return resp
+
+def result_etag(endpoint: str, digest: str, mode: str, flags, *extra) -> str:
+    # strong validator over every input the response body depends on; digest is docx_digest of the upload
+    h = hashlib.sha256()
+    for part in (RESULT_STORE_VERSION, endpoint, digest, mode, flags_key(flags)) + extra:
+        h.update(str(part).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+def not_modified(etag: str):
+    if etag not in request.if_none_match:
+        return None
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    return resp
+
+def with_etag(resp, etag: str, source: str):
+    resp.set_etag(etag)
+    resp.headers['X-Result-Cache'] = source
+    return resp
+
+def open_stored_result(etag: str):
+    if RESULT_STORE_MAX_BYTES <= 0:
+        return None
+    path = os.path.join(RESULT_STORE_DIR, etag)
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return None
+    try:
+        os.utime(path)  # mtime doubles as last-use time for eviction
+    except OSError:
+        pass
+    return f
+
+def send_stored_result(f, etag: str, mimetype: str, download_name=None):
+    resp = make_response(send_file(f, mimetype=mimetype, as_attachment=download_name is not None, download_name=download_name))
+    return with_etag(resp, etag, 'hit')
+
+def with_revision_report(resp, kind: str, blob: bytes, t0: float):
+    # a stored or 304 result skips rendering but not the revision index: with a doc_key the upload is still that
+    # document's newest revision, so it is diffed and recorded exactly as on a miss
+    doc_key = upload_doc_key()
+    if doc_key:
+        data = load_requirements(blob)
+        report = revision_diff(kind, doc_key, data, [content_fingerprint(r) for r in data])
+        resp.headers['X-Regen-Report'] = regen_report_header(report)
+    resp.headers['X-Process-Time'] = str(round(time.perf_counter() - t0, 3))
+    return resp
+
+def result_output():
+    # generation target: a temp file inside the store, published by commit_result, or a plain spool when the store is off
+    if RESULT_STORE_MAX_BYTES <= 0:
+        return spooled_output(), None
+    out = tempfile.NamedTemporaryFile(prefix='.tmp-', dir=RESULT_STORE_DIR, delete=False)
+    return out, out.name
+
+def commit_result(out, tmp_path, etag: str):
+    if tmp_path is None:
+        return
+    out.flush()
+    size = os.path.getsize(tmp_path)
+    os.replace(tmp_path, os.path.join(RESULT_STORE_DIR, etag))
+    note_result_stored(size)
+
+def discard_result(out, tmp_path):
+    out.close()
+    if tmp_path is not None:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+def store_result_bytes(etag: str, body: bytes):
+    out, tmp_path = result_output()
+    try:
+        out.write(body)
+        commit_result(out, tmp_path, etag)
+    finally:
+        out.close()
+
+def tee_to_result_store(chunks, etag: str):
+    # streams chunks through while copying them to the store; only a fully sent body is published
+    out, tmp_path = result_output()
+    done = False
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+            yield chunk
+        done = True
+    finally:
+        if done:
+            commit_result(out, tmp_path, etag)
+            out.close()
+        else:
+            discard_result(out, tmp_path)
+
+result_store_added = 0
+result_store_scanned_at = float('-inf')
+result_store_lock = threading.Lock()
+
+def note_result_stored(size: int):
+    # eviction scans the whole directory, so a process only runs it once it has added a sixteenth of the budget
+    # since its last scan or RESULT_STORE_EVICT_INTERVAL seconds have passed, not on every commit
+    global result_store_added, result_store_scanned_at
+    with result_store_lock:
+        result_store_added += size
+        now = time.monotonic()
+        if result_store_added < RESULT_STORE_MAX_BYTES // 16 and now - result_store_scanned_at < RESULT_STORE_EVICT_INTERVAL:
+            return
+        result_store_added = 0
+        result_store_scanned_at = now
+    evict_results()
+
+def evict_results():
+    # size-bounded across all workers sharing the directory: drop least recently used results first
+    entries, total, now = [], 0, time.time()
+    try:
+        scan = list(os.scandir(RESULT_STORE_DIR))
+    except OSError:
+        return
+    for entry in scan:
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        if entry.name.startswith('.tmp-'):
+            if now - st.st_mtime > RESULT_STORE_TMP_MAX_AGE:
+                try:
+                    os.unlink(entry.path)
+                except OSError:
+                    pass
+            continue
+        entries.append((st.st_mtime, st.st_size, entry.path))
+        total += st.st_size
+    entries.sort()
+    for _, size, path in entries:
+        if total <= RESULT_STORE_MAX_BYTES:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        total -= size
+
+def result_store_stats() -> dict:
+    count, total = 0, 0
+    if RESULT_STORE_MAX_BYTES > 0:
+        for entry in os.scandir(RESULT_STORE_DIR):
+            if not entry.name.startswith('.tmp-'):
+                try:
+                    total += entry.stat().st_size
+                    count += 1
+                except OSError:
+                    pass
+    return {'entries': count, 'bytes': total, 'maxBytes': RESULT_STORE_MAX_BYTES}
+
+def requirements_etag(digest: str) -> str:
+    return result_etag('requirements', digest, '', None)
+
+def iter_remembered(digest: str, requirements):
+    # passes requirements through while json.dump-ing them into the shared result store as one JSON array (published
+    # once complete), so /traceability pages can be requested by digest from any worker without holding the list
+    etag = requirements_etag(digest)
+    if RESULT_STORE_MAX_BYTES <= 0 or os.path.exists(os.path.join(RESULT_STORE_DIR, etag)):
+        yield from requirements
+        return
+    out, tmp_path = result_output()
+    text = io.TextIOWrapper(out, encoding='utf-8')
+    done = False
+    try:
+        text.write('[')
+        for n, r in enumerate(requirements):
+            if n:
+                text.write(',')
+            json.dump(r, text, ensure_ascii=False, separators=(',', ':'))
+            yield r
+        text.write(']')
+        done = True
+    finally:
+        text.detach()
+        if done:
+            commit_result(out, tmp_path, etag)
+            out.close()
+        else:
+            discard_result(out, tmp_path)
+
+def remember_requirements(digest: str, data):
+    for _ in iter_remembered(digest, data):
+        pass
+
+def requirements_for_digest(digest: str):
+    data = PARSE_CACHE.get(digest)
+    if data is None:
+        f = open_stored_result(requirements_etag(digest))
+        if f is None:
+            return None
+        with f:
+            data = json.load(f)
+        PARSE_CACHE.put(digest, data, requirements_nbytes(data))
+    return [dict(r, FitCriteria=list(r.get('FitCriteria') or [])) for r in data]
+
+@bp.route('/preview', methods=['POST'])
+def preview():
+    blob, err = read_docx_upload()
+    if err:
+        return err
+    mode, flags, guidelines = get_mode_flags_guidelines(request.form)
+    top_n = form_int('topN', 20)
+    if request.form.get('stream') == '1' or NDJSON_MIMETYPE in request.headers.get('Accept', ''):
+        return preview_stream(blob, mode, flags, guidelines, top_n)
+    digest = docx_digest(blob)
+    etag = result_etag('preview', digest, mode, flags, guidelines, top_n)
+    cached = not_modified(etag) or open_stored_result(etag)
+    if isinstance(cached, Response):
+        return cached
+    if cached:
+        return send_stored_result(cached, etag, 'application/json')
     t0 = time.perf_counter()
-    data = parse_requirements_from_docx(path)
-    overview = compute_overview(data, mode)
-    totals = compute_overview_totals(data, mode)
-    trace = build_traceability(data, mode, top_n=top_n)
+    with timed('parse'):
+        data = load_requirements(blob)
+    with timed('serialize'):
+        remember_requirements(digest, data)
+    with timed('plan'):
+        plans = build_plans(data, mode, flags)
+        overview = compute_overview(data, mode, plans)
+        totals = compute_overview_totals(data, mode, plans, flags)
+        trace = build_traceability(data, mode, top_n=top_n, plans=plans)
+    count_plans(plans)
     elapsed = round(time.perf_counter() - t0, 3)
-    return jsonify({'time': elapsed, 'data': data, 'rules': build_rules(mode, flags), 'overview': overview, 'overviewTotals': totals, 'traceability': trace, 'guidelines': guidelines})
+    with timed('serialize'):
+        resp = jsonify({'time': elapsed, 'digest': digest, 'data': data, 'rules': build_rules(mode, flags), 'overview': overview, 'overviewTotals': totals, 'traceability': trace, 'guidelines': guidelines})
+        store_result_bytes(etag, resp.get_data())
+    return with_etag(resp, etag, 'miss')
 
-@app.route('/upload', methods=['POST'])
+def preview_stream(blob: bytes, mode: str, flags, guidelines: str, top_n: int):
+    # the traceability summary is always bounded here: topN <= 0 or above the cap means PREVIEW_STREAM_MAX_TOP_N
+    top_n = min(top_n, PREVIEW_STREAM_MAX_TOP_N) if top_n > 0 else PREVIEW_STREAM_MAX_TOP_N
+    digest = docx_digest(blob)
+    etag = result_etag('preview-ndjson', digest, mode, flags, guidelines, top_n)
+    cached = not_modified(etag) or open_stored_result(etag)
+    if isinstance(cached, Response):
+        return cached
+    if cached:
+        return send_stored_result(cached, etag, NDJSON_MIMETYPE)
+    requirements = timed_iter(iter_requirements(blob), 'parse')
+    first = next(requirements, None)
+    pending = iter_remembered(digest, itertools.chain([first] if first else [], requirements))
+    records = timed_iter((current_app.json.dumps(rec) + '\n' for rec in iter_preview_records(pending, mode, flags, guidelines, top_n, digest)), 'serialize')
+    resp = Response(stream_with_context(tee_to_result_store(coalesce_chunks(records, size=1 << 12), etag)), mimetype=NDJSON_MIMETYPE)
+    return with_etag(resp, etag, 'miss')
+
+@bp.route('/traceability', methods=['POST'])
+def traceability():
+    # one page of the Sankey graph: requirements ranked as in /preview, sliced by offset/limit, links by node index;
+    # after the first page, send the digest returned by /preview (or this endpoint) instead of the file
+    digest = (request.form.get('digest') or '').strip().lower()
+    blob = None
+    if 'file' in request.files or not digest:
+        blob, err = read_docx_upload()
+        if err:
+            return err
+        digest = docx_digest(blob)
+    elif not DIGEST_RE.match(digest):
+        return jsonify({'error': 'Invalid digest'}), 400
+    mode, flags, _ = get_mode_flags_guidelines(request.form)
+    top_n = form_int('topN', 0)
+    offset = max(0, form_int('offset', 0))
+    limit = min(max(1, form_int('limit', TRACEABILITY_PAGE_SIZE)), TRACEABILITY_MAX_PAGE_SIZE)
+    etag = result_etag('traceability', digest, mode, flags, top_n, offset, limit)
+    cached = not_modified(etag) or open_stored_result(etag)
+    if isinstance(cached, Response):
+        return cached
+    if cached:
+        return send_stored_result(cached, etag, 'application/json')
+    with timed('parse'):
+        data = load_requirements(blob) if blob is not None else requirements_for_digest(digest)
+    if data is None:
+        return jsonify({'error': 'Unknown digest; send the file again'}), 404
+    if blob is not None:
+        with timed('serialize'):
+            remember_requirements(digest, data)
+    with timed('plan'):
+        plans = build_plans(data, mode, flags)
+        ranked = rank_for_traceability(data, plans, top_n)
+        page = ranked[offset:offset + limit]
+        nodes, links = traceability_graph(page)
+    count_plans([plan for _, plan in page])
+    end = offset + len(page)
+    meta = {'digest': digest, 'topN': top_n, 'reqs': len(ranked), 'offset': offset, 'limit': limit, 'returned': len(page), 'nextOffset': end if end < len(ranked) else None}
+    with timed('serialize'):
+        resp = jsonify({'nodes': nodes, 'links': links, 'meta': meta})
+        store_result_bytes(etag, resp.get_data())
+    return with_etag(resp, etag, 'miss')
+
+@bp.route('/upload', methods=['POST'])
 def upload_file():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    file = request.files['file']
-    if file.filename == '' or not file.filename.lower().endswith('.docx'):
-        return jsonify({'error': 'Invalid file (.docx expected)'}), 400
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-    mode, flags, guidelines = get_mode_flags_guidelines(request.form)
-    out = os.path.join(OUTPUT_FOLDER, 'gherkin_output.docx')
+    blob, err = read_docx_upload()
+    if err:
+        return err
     t0 = time.perf_counter()
-    _ = generate_gherkin_document(path, out, mode=mode, flags=flags, guidelines=guidelines)
-    elapsed = round(time.perf_counter() - t0, 3)
-    resp = make_response(send_file(out, as_attachment=True))
-    resp.headers['X-Process-Time'] = str(elapsed)
-    return resp
+    mode, flags, guidelines = get_mode_flags_guidelines(request.form)
+    etag = result_etag('upload', docx_digest(blob), mode, flags, guidelines, DOCX_WRITER)
+    cached = not_modified(etag) or open_stored_result(etag)
+    if isinstance(cached, Response):
+        return with_revision_report(cached, 'gherkin', blob, t0)
+    if cached:
+        return with_revision_report(send_stored_result(cached, etag, DOCX_MIMETYPE, 'gherkin_output.docx'), 'gherkin', blob, t0)
+    report = {}
+    out, tmp_path = result_output()
+    try:
+        t0 = time.perf_counter()
+        _ = generate_gherkin_document(blob, out, mode=mode, flags=flags, guidelines=guidelines, doc_key=upload_doc_key(), report=report)
+        elapsed = round(time.perf_counter() - t0, 3)
+        commit_result(out, tmp_path, etag)
+        resp = send_output(out, 'gherkin_output.docx', DOCX_MIMETYPE, elapsed)
+        resp.headers['X-Regen-Report'] = regen_report_header(report)
+        return with_etag(resp, etag, 'miss')
+    except Exception:
+        discard_result(out, tmp_path)
+        raise
 
-@app.route('/generate_playwright', methods=['POST'])
+@bp.route('/generate_playwright', methods=['POST'])
 def generate_playwright():
-    if 'file' not in request.files:
-        return jsonify({'error': 'No file part'}), 400
-    file = request.files['file']
-    if file.filename == '' or not file.filename.lower().endswith('.docx'):
-        return jsonify({'error': 'Invalid file (.docx expected)'}), 400
-    path = os.path.join(UPLOAD_FOLDER, file.filename)
-    file.save(path)
-    mode, _, _ = get_mode_flags_guidelines(request.form)
-    out_ts = os.path.join(OUTPUT_FOLDER, 'gherkin_tests.spec.ts')
+    blob, err = read_docx_upload()
+    if err:
+        return err
     t0 = time.perf_counter()
-    _ = generate_playwright_ts(path, out_ts, mode=mode)
-    elapsed = round(time.perf_counter() - t0, 3)
-    resp = make_response(send_file(out_ts, as_attachment=True))
-    resp.headers['X-Process-Time'] = str(elapsed)
-    return resp
+    mode, flags, _ = get_mode_flags_guidelines(request.form)
+    buffered = request.form.get('buffered') == '1'
+    # the two variants differ in headers (buffered adds X-Process-Time and X-Regen-Report), so they are stored apart
+    etag = result_etag('playwright', docx_digest(blob), mode, flags, buffered)
+    cached = not_modified(etag) or open_stored_result(etag)
+    if isinstance(cached, Response):
+        return with_revision_report(cached, 'playwright', blob, t0) if buffered else cached
+    if cached:
+        resp = send_stored_result(cached, etag, TS_MIMETYPE, 'gherkin_tests.spec.ts')
+        return with_revision_report(resp, 'playwright', blob, t0) if buffered else resp
+    if not buffered:
+        # chunked response: requirements are parsed and rendered one block at a time while the body is sent
+        requirements = timed_iter(iter_requirements(blob), 'parse')
+        first = next(requirements, None)
+        pending = itertools.chain([first] if first else [], requirements)
+        blocks = timed_iter(iter_playwright_ts(pending, mode, flags=flags), 'render')
+        resp = Response(stream_with_context(tee_to_result_store(coalesce_chunks(blocks), etag)), mimetype=TS_MIMETYPE)
+        resp.headers['Content-Disposition'] = 'attachment; filename=gherkin_tests.spec.ts'
+        return with_etag(resp, etag, 'miss')
+    report = {}
+    out, tmp_path = result_output()
+    try:
+        t0 = time.perf_counter()
+        _ = generate_playwright_ts(blob, out, mode=mode, flags=flags, doc_key=upload_doc_key(), report=report)
+        elapsed = round(time.perf_counter() - t0, 3)
+        commit_result(out, tmp_path, etag)
+        resp = send_output(out, 'gherkin_tests.spec.ts', TS_MIMETYPE, elapsed)
+        resp.headers['X-Regen-Report'] = regen_report_header(report)
+        return with_etag(resp, etag, 'miss')
+    except Exception:
+        discard_result(out, tmp_path)
+        raise
 
-def generate_gherkin_document(input_path, output_path, mode='optimized', flags=None, guidelines=''):
-    flags = flags or {}
-    data = parse_requirements_from_docx(input_path)
-    doc = Document()
-    for r in data:
-        req_id = r.get('ReqID', 'UNKNOWN')
-        req_name = r.get('ReqName', '')
-        topic = r.get('Topic', '') or r.get('ReqName', '')
-        requirement = r.get('Requirement', '')
-        rationale = r.get('Rationale', '')
-        fits = r.get('FitCriteria', [])
-        doc.add_paragraph(f'REQ ID: {req_id}')
-        doc.add_paragraph(f'REQ NAME: {req_name}')
-        doc.add_paragraph('')
-        doc.add_paragraph(f'Feature: {topic}')
-        actor = actor_from_text(requirement, flags)
-        doc.add_paragraph(f'As a {actor}')
-        doc.add_paragraph(f'I want {topic.lower()}')
-        doc.add_paragraph(f'So that {rationale or "business value is achieved"}')
-        doc.add_paragraph('')
-        mode_local = mode
-        if mode_local == 'atomized' and fits:
-            for i, fit in enumerate(fits, 1):
-                doc.add_paragraph(f'@REQ-{req_id}')
-                doc.add_paragraph(f'Scenario: {topic} — FIT {i}')
-                doc.add_paragraph('Given the user is logged in' if actor == 'the user' else f'Given {actor} is authenticated')
-                doc.add_paragraph(f'When the system evaluates requirement {req_id}')
-                doc.add_paragraph(f'Then {fit}')
-                doc.add_paragraph('')
+def feature_narrative(r: dict, plan) -> list:
+    topic = r.get('Topic', '') or r.get('ReqName', '')
+    return [f'As a {plan.actor}', f'I want {topic.lower()}', f'So that {r.get("Rationale", "") or "business value is achieved"}']
+
+def iter_scenarios(r: dict, mode: str, plan):
+    # the scenarios of one requirement as (tag, title, steps); shared by the .docx paragraphs and the .feature text
+    req_id = r.get('ReqID', 'UNKNOWN')
+    topic = r.get('Topic', '') or r.get('ReqName', '')
+    fits = plan.fits
+    tag = f'@REQ-{req_id}'
+    given = 'Given the user is logged in' if plan.actor == 'the user' else f'Given {plan.actor} is authenticated'
+    when = f'When the system evaluates requirement {req_id}'
+    if mode == 'atomized' and fits:
+        for i, fit in enumerate(fits, 1):
+            yield tag, f'{topic} — FIT {i}', [given, when, f'Then {fit}']
+        return
+    if plan.scenario_count == 1:
+        steps = [given, when]
+        if fits:
+            steps.append(f'Then it should satisfy {len(fits)} FIT criteria')
+            steps.extend(f'And {line}' for line in fits)
         else:
-            k = scenario_count_by_mode(fits, mode_local)
-            if k == 1:
-                doc.add_paragraph(f'@REQ-{req_id}')
-                doc.add_paragraph(f'Scenario: {topic}')
-                doc.add_paragraph('Given the user is logged in' if actor == 'the user' else f'Given {actor} is authenticated')
-                doc.add_paragraph(f'When the system evaluates requirement {req_id}')
-                if fits:
-                    doc.add_paragraph(f'Then it should satisfy {len(fits)} FIT criteria')
-                    for line in fits:
-                        doc.add_paragraph(f'And {line}')
-                else:
-                    doc.add_paragraph('Then it should meet the specified acceptance criteria')
-                doc.add_paragraph('')
-            else:
-                buckets = themed_buckets(fits, k)
-                for idx, (name, lines) in enumerate(buckets, 1):
-                    doc.add_paragraph(f'@REQ-{req_id}')
-                    suffix = f' — {name.title()}' if name and name != 'misc' else f' — Group {idx}'
-                    doc.add_paragraph(f'Scenario: {topic}{suffix}')
-                    doc.add_paragraph('Given the user is logged in' if actor == 'the user' else f'Given {actor} is authenticated')
-                    doc.add_paragraph(f'When the system evaluates requirement {req_id}')
-                    if lines:
-                        for j, line in enumerate(lines):
-                            if j == 0:
-                                doc.add_paragraph(f'Then {line}')
-                            else:
-                                doc.add_paragraph(f'And {line}')
-                    else:
-                        doc.add_paragraph('Then it should meet the specified acceptance criteria')
-                    doc.add_paragraph('')
-    def append_meta(document):
-        document.add_paragraph('Rules Applied', style='Heading 1')
-        for rr in build_rules(mode, flags):
-            document.add_paragraph(f'- {rr}')
-        if guidelines:
-            document.add_paragraph('Guidelines (provided)', style='Heading 1')
-            for line in guidelines.splitlines():
-                document.add_paragraph(line)
-    doc.save(output_path)
-    doc2 = Document(output_path)
-    append_meta(doc2)
-    doc2.add_paragraph('Summary Table', style='Heading 1')
-    tbl = doc2.add_table(rows=1, cols=5, style='Table Grid')
-    hdr = ['Topic', 'Req ID', 'Name', '# FIT Criteria', '# Gherkin Scenarios']
-    for i, h in enumerate(hdr):
+            steps.append('Then it should meet the specified acceptance criteria')
+        yield tag, topic, steps
+        return
+    for idx, (name, lines) in enumerate(plan.buckets, 1):
+        suffix = f' — {name.title()}' if name and name != 'misc' else f' — Group {idx}'
+        steps = [given, when]
+        if lines:
+            steps.extend(f'Then {line}' if j == 0 else f'And {line}' for j, line in enumerate(lines))
+        else:
+            steps.append('Then it should meet the specified acceptance criteria')
+        yield tag, f'{topic}{suffix}', steps
+
+GHERKIN_CELL_ESCAPES = str.maketrans({'\\': '\\\\', '|': '\\|', '\n': '\\n'})
+
+def outline_scenarios(scenarios) -> list:
+    # scenarios with the same tag and step keywords differ only in their fit text: each such group becomes one
+    # Scenario Outline (placed where its first member was) whose varying steps read <fit> from an Examples table;
+    # returns (tag, title, steps, examples) with examples = (columns, rows), or None for a plain scenario
+    groups = {}
+    for tag, title, steps in scenarios:
+        groups.setdefault((tag, tuple(step.split(' ', 1)[0] for step in steps)), []).append((title, steps))
+    out = []
+    for (tag, _), members in groups.items():
+        if len(members) == 1:
+            out.append((tag, members[0][0], members[0][1], None))
+            continue
+        first = members[0][1]
+        varying = [j for j in range(len(first)) if any(steps[j] != first[j] for _, steps in members)]
+        names = ['fit'] if len(varying) == 1 else [f'fit {n}' for n in range(1, len(varying) + 1)]
+        steps = list(first)
+        for j, name in zip(varying, names):
+            steps[j] = f'{first[j].split(" ", 1)[0]} <{name}>'
+        common = os.path.commonprefix([title for title, _ in members])
+        prefix = common[:common.rfind(' — ') + 3] if ' — ' in common else ''
+        rows = [[title[len(prefix):]] + [s[j].partition(' ')[2] for j in varying] for title, s in members]
+        out.append((tag, f'{prefix}<case>', steps, (['case'] + names, rows)))
+    return out
+
+def scenario_blocks(r: dict, mode: str, plan, outline: bool = False) -> list:
+    scenarios = iter_scenarios(r, mode, plan)
+    return outline_scenarios(scenarios) if outline else [(tag, title, steps, None) for tag, title, steps in scenarios]
+
+def gherkin_table_row(cells) -> str:
+    return '| ' + ' | '.join(c.translate(GHERKIN_CELL_ESCAPES) for c in cells) + ' |'
+
+def scenario_paragraphs(tag: str, title: str, steps, examples) -> list:
+    if examples is None:
+        return [tag, f'Scenario: {title}', *steps]
+    columns, rows = examples
+    return [tag, f'Scenario Outline: {title}', *steps, 'Examples:', gherkin_table_row(columns), *map(gherkin_table_row, rows)]
+
+def gherkin_paragraphs_for_requirement(r: dict, mode: str, flags, plan=None) -> list:
+    plan = plan or ScenarioPlan(r, mode, flags)
+    topic = r.get('Topic', '') or r.get('ReqName', '')
+    out = [f'REQ ID: {r.get("ReqID", "UNKNOWN")}', f'REQ NAME: {r.get("ReqName", "")}', '', f'Feature: {topic}']
+    out.extend(feature_narrative(r, plan))
+    out.append('')
+    for block in scenario_blocks(r, mode, plan, bool((flags or {}).get('opt_outline'))):
+        out.extend(scenario_paragraphs(*block))
+        out.append('')
+    return out
+
+def outline_counts(r: dict, mode: str, plan) -> tuple:
+    # (scenarios, paragraphs) of the scenario sections without and with outline compaction
+    scenarios = list(iter_scenarios(r, mode, plan))
+    blocks = outline_scenarios(scenarios)
+    return (len(scenarios), len(blocks),
+            sum(len(scenario_paragraphs(tag, title, steps, None)) + 1 for tag, title, steps in scenarios),
+            sum(len(scenario_paragraphs(*block)) + 1 for block in blocks))
+
+def outline_totals(counts) -> dict:
+    before, after, para_before, para_after = counts
+    return {'scenarios': before, 'outlineScenarios': after, 'scenarioReduction': round(1 - after / before, 4) if before else 0.0,
+            'paragraphs': para_before, 'outlineParagraphs': para_after,
+            'paragraphReduction': round(1 - para_after / para_before, 4) if para_before else 0.0}
+
+SUMMARY_HEADER = ['Topic', 'Req ID', 'Name', '# FIT Criteria', '# Gherkin Scenarios']
+
+def gherkin_meta_paragraphs(mode: str, flags, guidelines: str) -> list:
+    out = [('Rules Applied', 'Heading 1')]
+    out.extend((f'- {rr}', None) for rr in build_rules(mode, flags))
+    if guidelines:
+        out.append(('Guidelines (provided)', 'Heading 1'))
+        out.extend((line, None) for line in guidelines.splitlines())
+    out.append(('Summary Table', 'Heading 1'))
+    return out
+
+def summary_row(r: dict, plan) -> tuple:
+    return (r.get('Topic', '') or '', r.get('ReqID', '') or '', r.get('ReqName', '') or '', str(len(plan.fits)), str(plan.scenario_count))
+
+def summary_rows(data, mode: str, plans=None) -> list:
+    plans = plans or build_plans(data, mode)
+    return [summary_row(r, plan) for r, plan in zip(data, plans)]
+
+docx_document_template = None
+
+def new_docx_document():
+    # a deep copy of a pristine Document loaded once, instead of Document() re-reading and re-parsing the package
+    global docx_document_template
+    if docx_document_template is None:
+        from docx import Document
+        docx_document_template = Document(DOCX_TEMPLATE_PATH)
+    return copy.deepcopy(docx_document_template)
+
+def write_gherkin_docx_python_docx(paragraphs, rows, output):
+    doc = new_docx_document()
+    for text, style in paragraphs:
+        doc.add_paragraph(text, style=style)
+    tbl = doc.add_table(rows=1, cols=len(SUMMARY_HEADER), style='Table Grid')
+    for i, h in enumerate(SUMMARY_HEADER):
         cell = tbl.rows[0].cells[i]
         cell.text = h
         for run in cell.paragraphs[0].runs:
             run.bold = True
-    parsed = parse_requirements_from_docx(input_path)
-    for r in parsed:
-        fits = r.get('FitCriteria', [])
-        row = tbl.add_row().cells
-        row[0].text = r.get('Topic', '') or ''
-        row[1].text = r.get('ReqID', '') or ''
-        row[2].text = r.get('ReqName', '') or ''
-        row[3].text = str(len(fits))
-        row[4].text = str(scenario_count_by_mode(fits, mode))
-    doc2.save(output_path)
+    for values in rows:
+        cells = tbl.add_row().cells
+        for i, v in enumerate(values):
+            cells[i].text = v
+    doc.save(output)
+
+# located without importing python-docx, which only the python-docx parser/writer need
+DOCX_TEMPLATE_PATH = os.path.join(os.path.dirname(importlib.util.find_spec('docx').origin), 'templates', 'default.docx')
+WML_STYLE_IDS = {'Heading 1': 'Heading1', 'Table Grid': 'TableGrid'}
+WML_RUN_SPLIT_RE = re.compile(r'([\t\r\n])')
+XML_INVALID_CHARS_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+WML_TABLE_LOOK = '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+docx_template = None
+
+def load_docx_template():
+    # python-docx's default package, split once into a zip of every part except word/document.xml plus the
+    # document.xml head (namespaces) and sectPr, so each output only appends its own document part
+    global docx_template
+    if docx_template is not None:
+        return docx_template
+    with open(DOCX_TEMPLATE_PATH, 'rb') as f:
+        raw = f.read()
+    buf = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(raw)) as src, zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as dst:
+        document_part = main_document_part(src)
+        document_xml = src.read(document_part).decode('utf-8')
+        for info in src.infolist():
+            if info.filename != document_part:
+                dst.writestr(info, src.read(info.filename), compress_type=zipfile.ZIP_DEFLATED)
+    body_at = document_xml.index('<w:body>') + len('<w:body>')
+    sect_pr = re.search(r'<w:sectPr\b.*?</w:sectPr>', document_xml, re.S).group(0)
+    page_w = int(re.search(r'<w:pgSz\b[^>]*\bw:w="(\d+)"', sect_pr).group(1))
+    margin_l = int(re.search(r'<w:pgMar\b[^>]*\bw:left="(\d+)"', sect_pr).group(1))
+    margin_r = int(re.search(r'<w:pgMar\b[^>]*\bw:right="(\d+)"', sect_pr).group(1))
+    docx_template = {
+        'parts_zip': buf.getvalue(),
+        'document_part': document_part,
+        'head': re.sub(r'>\s+<', '><', document_xml[:body_at]),
+        'sect_pr': re.sub(r'>\s+<', '><', sect_pr),
+        'block_width': page_w - margin_l - margin_r,
+    }
+    return docx_template
+
+def wml_run(text: str, bold: bool = False) -> str:
+    # same run content python-docx produces for Run.text = text (tabs → w:tab, line breaks → w:br)
+    out = ['<w:r>']
+    if bold:
+        out.append('<w:rPr><w:b/></w:rPr>')
+    for piece in WML_RUN_SPLIT_RE.split(XML_INVALID_CHARS_RE.sub('', text)):
+        if not piece:
+            continue
+        if piece == '\t':
+            out.append('<w:tab/>')
+        elif piece in '\r\n':
+            out.append('<w:br/>')
+        elif len(piece.strip()) < len(piece):
+            out.append(f'<w:t xml:space="preserve">{xml_escape(piece)}</w:t>')
+        else:
+            out.append(f'<w:t>{xml_escape(piece)}</w:t>')
+    out.append('</w:r>')
+    return ''.join(out)
+
+def wml_paragraph(text: str, style=None) -> str:
+    ppr = f'<w:pPr><w:pStyle w:val="{WML_STYLE_IDS.get(style, style)}"/></w:pPr>' if style else ''
+    if not text:
+        return f'<w:p>{ppr}</w:p>' if ppr else '<w:p/>'
+    return f'<w:p>{ppr}{wml_run(text)}</w:p>'
+
+def wml_table_row(values, col_w: int, bold: bool = False) -> str:
+    cells = ''.join(f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{col_w}"/></w:tcPr><w:p>{wml_run(v, bold) if v or bold else "<w:r/>"}</w:p></w:tc>' for v in values)
+    return f'<w:tr>{cells}</w:tr>'
+
+def write_gherkin_docx_stream(fragments, rows, output, flush_at: int = 1 << 16):
+    # writes word/document.xml straight into the package: fragments are ready-made WordprocessingML body elements,
+    # rows the summary table's <w:tr> elements (only read once every fragment has been written)
+    tmpl = load_docx_template()
+    col_w = tmpl['block_width'] // len(SUMMARY_HEADER)
+    if hasattr(output, 'write'):
+        output.write(tmpl['parts_zip'])
+        target = output
+    else:
+        target = open(output, 'w+b')
+        target.write(tmpl['parts_zip'])
+    try:
+        target.seek(0)
+        with zipfile.ZipFile(target, 'a', zipfile.ZIP_DEFLATED) as zf, zf.open(tmpl['document_part'], 'w') as fp:
+            buf, size = [tmpl['head']], 0
+
+            def emit(chunk):
+                nonlocal size
+                buf.append(chunk)
+                size += len(chunk)
+                if size >= flush_at:
+                    fp.write(''.join(buf).encode('utf-8'))
+                    buf.clear()
+                    size = 0
+
+            for fragment in fragments:
+                emit(fragment)
+            emit('<w:tbl><w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/>' + WML_TABLE_LOOK + '</w:tblPr><w:tblGrid>')
+            emit(f'<w:gridCol w:w="{col_w}"/>' * len(SUMMARY_HEADER) + '</w:tblGrid>')
+            emit(wml_table_row(SUMMARY_HEADER, col_w, bold=True))
+            for row in rows:
+                emit(row)
+            emit('</w:tbl>' + tmpl['sect_pr'] + '</w:body></w:document>')
+            fp.write(''.join(buf).encode('utf-8'))
+    finally:
+        if target is not output:
+            target.close()
+
+def iter_gherkin_paragraphs(data, mode: str, flags, guidelines: str, progress=None, plans=None, fingerprints=None, stats=None):
+    plans = plans or build_plans(data, mode, flags)
+    pre = parallel_renders('gherkin', data, mode, flags, fingerprints)
+    for i, (r, plan) in enumerate(zip(data, plans), 1):
+        fp = fingerprints[i - 1] if fingerprints else None
+        paragraphs = cached_render('gherkin', r, mode, flags, lambda: pre and pre.pop(i - 1) or tuple(gherkin_paragraphs_for_requirement(r, mode, flags, plan)), fp, stats)
+        for text in paragraphs:
+            yield text, None
+        if progress:
+            progress(i, len(data))
+    yield from gherkin_meta_paragraphs(mode, flags, guidelines)
+
+def requirement_wml(r: dict, mode: str, flags, plan) -> tuple:
+    # (its paragraphs as one string of <w:p> elements, its summary table <w:tr>)
+    col_w = load_docx_template()['block_width'] // len(SUMMARY_HEADER)
+    paragraphs = ''.join(wml_paragraph(text) for text in gherkin_paragraphs_for_requirement(r, mode, flags, plan))
+    return paragraphs, wml_table_row(summary_row(r, plan), col_w)
+
+def iter_gherkin_wml(data, mode: str, flags, guidelines: str, rows: list, progress=None, plans=None, fingerprints=None, stats=None):
+    # the stream writer's body: each requirement is rendered (in the render pool for large documents) and cached as
+    # finished WordprocessingML, so the writer only concatenates; summary table rows are appended to rows
+    plans = plans or build_plans(data, mode, flags)
+    pre = parallel_renders('gherkin-wml', data, mode, flags, fingerprints)
+    for i, (r, plan) in enumerate(zip(data, plans), 1):
+        fp = fingerprints[i - 1] if fingerprints else None
+        paragraphs, row = cached_render('gherkin-wml', r, mode, flags, lambda: pre and pre.pop(i - 1) or requirement_wml(r, mode, flags, plan), fp, stats)
+        rows.append(row)
+        yield paragraphs
+        if progress:
+            progress(i, len(data))
+    for text, style in gherkin_meta_paragraphs(mode, flags, guidelines):
+        yield wml_paragraph(text, style)
+
+def generate_gherkin_document(input_path, output_path, mode='optimized', flags=None, guidelines='', progress=None, doc_key=None, report=None):
+    flags = flags or {}
+    with timed('parse'):
+        data = load_requirements(input_path)
+    with timed('plan'):
+        fps = [content_fingerprint(r) for r in data]
+        plans = build_plans(data, mode, flags)
+    count_plans(plans)
+    stats = {'cacheHits': 0, 'cacheMisses': 0}
+    with timed('serialize'):
+        if DOCX_WRITER == 'python-docx':
+            paragraphs = timed_iter(iter_gherkin_paragraphs(data, mode, flags, guidelines, progress=progress, plans=plans, fingerprints=fps, stats=stats), 'render')
+            write_gherkin_docx_python_docx(paragraphs, summary_rows(data, mode, plans), output_path)
+        else:
+            rows = []
+            fragments = timed_iter(iter_gherkin_wml(data, mode, flags, guidelines, rows, progress=progress, plans=plans, fingerprints=fps, stats=stats), 'render')
+            write_gherkin_docx_stream(fragments, rows, output_path)
+    if report is not None:
+        report.update(revision_diff('gherkin', doc_key, data, fps))
+        report.update(stats)
     return True
 
+render_pool = None
+render_pool_pid = None
+render_pool_lock = threading.Lock()
+serial_render_only = False
+
+def init_pool_worker():
+    # job and batch pool processes render serially rather than starting pools of their own
+    global serial_render_only
+    serial_render_only = True
+
+def get_render_pool():
+    global render_pool, render_pool_pid
+    with render_pool_lock:
+        if render_pool is None or render_pool_pid != os.getpid():
+            render_pool = ProcessPoolExecutor(max_workers=PARALLEL_RENDER_WORKERS, mp_context=multiprocessing.get_context(JOBS_MP_START), initializer=init_pool_worker)
+            render_pool_pid = os.getpid()
+        return render_pool
+
+def reset_render_pool(pool):
+    global render_pool
+    with render_pool_lock:
+        if render_pool is pool:
+            render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def render_chunk(kind: str, chunk, mode: str, flags) -> list:
+    # executes inside a render pool process; plans are built exactly as the serial loops build them
+    if kind == 'ts':
+        return [render_ts_block_for_requirement(r, mode, ScenarioPlan(r, mode), bool((flags or {}).get('opt_outline'))) for r in chunk]
+    if kind == 'gherkin-wml':
+        return [requirement_wml(r, mode, flags, ScenarioPlan(r, mode, flags)) for r in chunk]
+    return [tuple(gherkin_paragraphs_for_requirement(r, mode, flags, ScenarioPlan(r, mode, flags))) for r in chunk]
+
+class ParallelRenders:
+    # render-cache misses rendered in the pool in contiguous chunks; each chunk is collected when the serial loop
+    # first reaches one of its requirements, so output order and bytes are those of the serial path
+    def __init__(self, pool, kind: str, data, indices, mode: str, flags):
+        self.pool = pool
+        self.chunk_of, self.chunks, self.ready = {}, [], {}
+        size = max(PARALLEL_RENDER_MIN_CHUNK, -(-len(indices) // (PARALLEL_RENDER_WORKERS * 4)))
+        for start in range(0, len(indices), size):
+            part = indices[start:start + size]
+            try:
+                future = pool.submit(render_chunk, kind, [data[i] for i in part], mode, flags)
+            except BrokenProcessPool:
+                reset_render_pool(pool)
+                break
+            except RuntimeError:
+                # shut down by another request's reset_render_pool: the rest renders serially
+                break
+            self.chunks.append([part, future])
+            for i in part:
+                self.chunk_of[i] = len(self.chunks) - 1
+
+    def pop(self, i: int):
+        # None means "render it serially": not a miss at planning time, or the pool died or was shut down under us
+        j = self.chunk_of.pop(i, None)
+        if j is None:
+            return None
+        part, future = self.chunks[j]
+        if future is not None:
+            self.chunks[j][1] = None
+            try:
+                self.ready.update(zip(part, future.result()))
+            except BrokenProcessPool:
+                reset_render_pool(self.pool)
+                self.chunk_of.clear()
+                return None
+            except (CancelledError, RuntimeError):
+                # cancelled by another request's reset_render_pool; a render error surfaces again on the serial path
+                self.chunk_of.clear()
+                return None
+        return self.ready.pop(i, None)
+
+def parallel_renders(kind: str, data, mode: str, flags, fingerprints=None):
+    if PARALLEL_RENDER_WORKERS <= 1 or serial_render_only or len(data) < PARALLEL_RENDER_MIN_REQS:
+        return None
+    misses = [i for i, r in enumerate(data) if render_key(kind, r, mode, flags, fingerprints[i] if fingerprints else None) not in RENDER_CACHE]
+    if len(misses) < PARALLEL_RENDER_MIN_REQS:
+        return None
+    return ParallelRenders(get_render_pool(), kind, data, misses, mode, flags)
+
+FEATURE_LAYOUTS = ('combined', 'per-requirement')
+FEATURE_ARCHIVES = {'none': ('.feature', 'text/x-gherkin; charset=utf-8'), 'gzip': ('.feature.gz', 'application/gzip'), 'zip': ('.features.zip', 'application/zip')}
+FEATURE_LINE_BREAK_RE = re.compile(r'\s*[\r\n]+\s*')
+FEATURE_FILENAME_RE = re.compile(r'[^A-Za-z0-9._-]+')
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+def feature_line(text: str) -> str:
+    # Gherkin is line-oriented: line breaks inside a parsed paragraph would start a new (invalid) step
+    return FEATURE_LINE_BREAK_RE.sub(' ', text or '').strip()
+
+def feature_block_for_requirement(r: dict, mode: str, plan, rule: bool = False, outline: bool = False) -> str:
+    # a standalone Feature, or a Rule nested in the combined file's Feature
+    pad = '  ' if rule else ''
+    topic = r.get('Topic', '') or r.get('ReqName', '')
+    lines = [f'{pad}# REQ ID: {r.get("ReqID", "UNKNOWN")}', f'{pad}# REQ NAME: {feature_line(r.get("ReqName", ""))}',
+             f'{pad}{"Rule" if rule else "Feature"}: {feature_line(topic)}']
+    lines.extend(f'{pad}  {feature_line(line)}' for line in feature_narrative(r, plan))
+    for tag, title, steps, examples in scenario_blocks(r, mode, plan, outline):
+        lines.extend(['', f'{pad}  {tag}', f'{pad}  {"Scenario Outline" if examples else "Scenario"}: {feature_line(title)}'])
+        lines.extend(f'{pad}    {feature_line(step)}' for step in steps)
+        if examples:
+            columns, rows = examples
+            lines.append(f'{pad}    Examples:')
+            lines.extend(f'{pad}      {gherkin_table_row([feature_line(c) for c in row])}' for row in [columns] + rows)
+    return '\n'.join(lines) + '\n'
+
+def iter_feature_files(requirements, mode: str, flags, stats=None):
+    # per-requirement layout: (file name, text) with one Feature per requirement
+    used = set()
+    for r in requirements:
+        plan = ScenarioPlan(r, mode, flags)
+        text = cached_render('feature', r, mode, flags, lambda: feature_block_for_requirement(r, mode, plan, outline=bool(flags.get('opt_outline'))), None, stats)
+        count_document(1, len(plan.fits), plan.scenario_count)
+        yield batch_output_stem(f'REQ-{r.get("ReqID", "UNKNOWN")}', used) + '.feature', text
+
+def iter_combined_feature(requirements, mode: str, flags, title: str, stats=None):
+    # combined layout: one Feature for the document, one Rule per requirement
+    yield f'Feature: {feature_line(title)}\n'
+    for r in requirements:
+        plan = ScenarioPlan(r, mode, flags)
+        yield '\n' + cached_render('feature-rule', r, mode, flags, lambda: feature_block_for_requirement(r, mode, plan, rule=True, outline=bool(flags.get('opt_outline'))), None, stats)
+        count_document(1, len(plan.fits), plan.scenario_count)
+
+class ChunkSink:
+    # write-only file object for zipfile: collects what was written since the last drain (zipfile falls back to
+    # data descriptors because there is no tell/seek)
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        out = b''.join(self.chunks)
+        self.chunks.clear()
+        return out
+
+def iter_zip_stream(entries):
+    # entries: (name, text pieces); members are written with a fixed timestamp so equal inputs give equal bytes
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, pieces in entries:
+            info = zipfile.ZipInfo(name, date_time=ZIP_EPOCH)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, 'w') as fp:
+                for chunk in coalesce_chunks(pieces, size=1 << 16):
+                    fp.write(chunk)
+                    out = sink.drain()
+                    if out:
+                        yield out
+            out = sink.drain()
+            if out:
+                yield out
+    yield sink.drain()
+
+def iter_gzip_stream(chunks):
+    comp = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container, mtime 0
+    for chunk in chunks:
+        out = comp.compress(chunk)
+        if out:
+            yield out
+    yield comp.flush()
+
+@bp.route('/generate_feature', methods=['POST'])
+def generate_feature():
+    blob, err = read_docx_upload()
+    if err:
+        return err
+    mode, flags, _ = get_mode_flags_guidelines(request.form)
+    layout = (request.form.get('layout') or 'combined').strip().lower()
+    if layout not in FEATURE_LAYOUTS:
+        layout = 'combined'
+    archive = (request.form.get('archive') or 'none').strip().lower()
+    if archive not in FEATURE_ARCHIVES or layout == 'per-requirement':
+        archive = 'zip' if layout == 'per-requirement' else 'none'
+    title = batch_output_stem(request.files['file'].filename, set())
+    stem = FEATURE_FILENAME_RE.sub('_', title)
+    etag = result_etag('feature', docx_digest(blob), mode, flags, layout, archive, title)
+    suffix, mimetype = FEATURE_ARCHIVES[archive]
+    cached = not_modified(etag) or open_stored_result(etag)
+    if isinstance(cached, Response):
+        return cached
+    if cached:
+        return send_stored_result(cached, etag, mimetype, stem + suffix)
+    requirements = timed_iter(iter_requirements(blob), 'parse')
+    first = next(requirements, None)
+    pending = itertools.chain([first] if first else [], requirements)
+    if layout == 'per-requirement':
+        files = timed_iter(iter_feature_files(pending, mode, flags), 'render')
+        body = iter_zip_stream((name, [text]) for name, text in files)
+    else:
+        pieces = timed_iter(iter_combined_feature(pending, mode, flags, title), 'render')
+        if archive == 'zip':
+            body = iter_zip_stream([(stem + '.feature', pieces)])
+        elif archive == 'gzip':
+            body = iter_gzip_stream(coalesce_chunks(pieces, size=1 << 16))
+        else:
+            body = coalesce_chunks(pieces)
+    resp = Response(stream_with_context(tee_to_result_store(timed_iter(body, 'serialize'), etag)), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename={stem + suffix}'
+    return with_etag(resp, etag, 'miss')
+
+JOBS_MAX_WORKERS = int(os.environ.get('JOBS_MAX_WORKERS', str(max(1, (os.cpu_count() or 2) - 1))))
+JOBS_MAX_PENDING = int(os.environ.get('JOBS_MAX_PENDING', '32'))
+JOBS_RESULT_TTL = float(os.environ.get('JOBS_RESULT_TTL', '3600'))
+JOBS_MAX_RESULTS = int(os.environ.get('JOBS_MAX_RESULTS', '64'))
+JOBS_MAX_RESULT_BYTES = int(os.environ.get('JOBS_MAX_RESULT_BYTES', str(1024 * 1024 * 1024)))
+JOBS_PROGRESS_INTERVAL = float(os.environ.get('JOBS_PROGRESS_INTERVAL', '0.25'))
+JOBS_MP_START = os.environ.get('JOBS_MP_START', 'spawn')
+JOBS_DIR = os.path.join(OUTPUT_FOLDER, 'jobs')
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+JOB_KINDS = {
+    'gherkin': ('gherkin_output.docx', DOCX_MIMETYPE),
+    'playwright': ('gherkin_tests.spec.ts', TS_MIMETYPE),
+    'batch': ('gherkin_batch.zip', 'application/zip'),
+}
+os.makedirs(JOBS_DIR, exist_ok=True)
+
+# job state lives in outputs/jobs so every gunicorn worker sees every job: <id>.json is the state (written by the
+# accepting worker, then only by the pool process running the job), <id>.result the output, <id>.cancel a cancel request
+job_futures = {}
+jobs_lock = threading.Lock()
+job_pool = None
+job_pool_pid = None
+
+class JobCancelled(Exception):
+    pass
+
+def job_path(job_id: str, ext: str) -> str:
+    return os.path.join(JOBS_DIR, job_id + ext)
+
+def read_job(job_id: str):
+    if not JOB_ID_RE.match(job_id or ''):
+        return None
+    try:
+        with open(job_path(job_id, '.json'), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_job(job: dict):
+    job['updatedAt'] = time.time()
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=JOBS_DIR)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(job, f)
+    os.replace(tmp, job_path(job['id'], '.json'))
+
+def job_cancel_requested(job_id: str) -> bool:
+    return os.path.exists(job_path(job_id, '.cancel'))
+
+def remove_job(job_id: str):
+    for ext in ('.json', '.result', '.cancel'):
+        try:
+            os.unlink(job_path(job_id, ext))
+        except OSError:
+            pass
+
+def finish_job_state(job: dict, status: str, error=None):
+    job['status'] = status
+    job['error'] = error
+    job['finishedAt'] = time.time()
+    write_job(job)
+
+def job_progress_reporter(job: dict):
+    last = 0.0
+
+    def progress(done: int, total: int):
+        # throttled: persists progress and picks up cancel requests, which stop the render at the next requirement
+        nonlocal last
+        now = time.monotonic()
+        if done == total or now - last >= JOBS_PROGRESS_INTERVAL:
+            last = now
+            if job_cancel_requested(job['id']):
+                raise JobCancelled()
+            job['progress'] = {'done': done, 'total': total}
+            write_job(job)
+    return progress
+
+def run_job(job_id: str, kind: str, blob, mode: str, flags, guidelines: str, targets=None):
+    # executes inside a pool process; renders straight into a file under JOBS_DIR and publishes it with the final state;
+    # for batch jobs blob is the list of (name, bytes) and progress counts files
+    job = read_job(job_id)
+    if job is None:
+        return
+    if job_cancel_requested(job_id):
+        finish_job_state(job, 'cancelled')
+        return
+    job['status'] = 'running'
+    write_job(job)
+    progress = job_progress_reporter(job)
+    fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=JOBS_DIR)
+    try:
+        with os.fdopen(fd, 'w+b') as out:
+            if kind == 'batch':
+                render_batch(blob, out, mode, flags, guidelines, targets, progress=progress)
+            elif kind == 'playwright':
+                generate_playwright_ts(blob, out, mode=mode, progress=progress, flags=flags)
+            else:
+                generate_gherkin_document(blob, out, mode=mode, flags=flags, guidelines=guidelines, progress=progress)
+        if job_cancel_requested(job_id):
+            raise JobCancelled()
+        os.replace(tmp, job_path(job_id, '.result'))
+    except JobCancelled:
+        os.unlink(tmp)
+        finish_job_state(job, 'cancelled')
+        return
+    except Exception as e:
+        os.unlink(tmp)
+        finish_job_state(job, 'failed', f'{type(e).__name__}: {e}')
+        return
+    total = len(blob) if kind == 'batch' else len(load_requirements(blob))
+    job['progress'] = {'done': total, 'total': total}
+    finish_job_state(job, 'done')
+
+def get_job_pool():
+    # created lazily per process so gunicorn workers never inherit a pool across fork
+    global job_pool, job_pool_pid
+    with jobs_lock:
+        if job_pool is None or job_pool_pid != os.getpid():
+            job_pool = ProcessPoolExecutor(max_workers=JOBS_MAX_WORKERS, mp_context=multiprocessing.get_context(JOBS_MP_START), initializer=init_pool_worker)
+            job_pool_pid = os.getpid()
+        return job_pool
+
+def reset_job_pool(pool):
+    global job_pool
+    with jobs_lock:
+        if job_pool is pool:
+            job_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def finish_job(job_id: str, pool, future):
+    # run_job records its own outcome; this only covers jobs that never ran or whose process died
+    with jobs_lock:
+        job_futures.pop(job_id, None)
+    try:
+        future.result()
+        return
+    except CancelledError:
+        status, error = 'cancelled', None
+    except BrokenProcessPool as e:
+        status, error = 'failed', f'worker crashed: {e}'
+        reset_job_pool(pool)
+    except Exception as e:
+        status, error = 'failed', f'{type(e).__name__}: {e}'
+    job = read_job(job_id)
+    if job and not job['finishedAt']:
+        finish_job_state(job, status, error)
+
+def iter_jobs():
+    for entry in os.scandir(JOBS_DIR):
+        if entry.name.endswith('.json') and not entry.name.startswith('.tmp-'):
+            job = read_job(entry.name[:-5])
+            if job:
+                yield job
+
+def expire_jobs():
+    # drops jobs finished more than JOBS_RESULT_TTL ago (or unfinished and silent that long: their worker is gone),
+    # then the oldest finished jobs beyond JOBS_MAX_RESULTS / JOBS_MAX_RESULT_BYTES; stale temp files go too
+    now, finished = time.time(), []
+    for job in iter_jobs():
+        if now - (job['finishedAt'] or job['updatedAt']) > JOBS_RESULT_TTL:
+            remove_job(job['id'])
+        elif job['finishedAt']:
+            try:
+                size = os.path.getsize(job_path(job['id'], '.result'))
+            except OSError:
+                size = 0
+            finished.append((job['finishedAt'], size, job['id']))
+    finished.sort(reverse=True)
+    kept, kept_bytes = 0, 0
+    for _, size, job_id in finished:
+        if kept >= JOBS_MAX_RESULTS or kept_bytes + size > JOBS_MAX_RESULT_BYTES:
+            remove_job(job_id)
+            continue
+        kept += 1
+        kept_bytes += size
+    for entry in os.scandir(JOBS_DIR):
+        if entry.name.startswith('.tmp-'):
+            try:
+                if now - entry.stat().st_mtime > JOBS_RESULT_TTL:
+                    os.unlink(entry.path)
+            except OSError:
+                pass
+
+def job_view(job):
+    status = job['status']
+    if status in ('queued', 'running') and job_cancel_requested(job['id']):
+        status = 'cancelled'
+    expires = job['finishedAt'] + JOBS_RESULT_TTL if job['finishedAt'] else None
+    return {'id': job['id'], 'kind': job['kind'], 'mode': job['mode'], 'status': status, 'progress': dict(job['progress']),
+            'createdAt': job['createdAt'], 'finishedAt': job['finishedAt'], 'expiresAt': expires, 'error': job['error']}
+
+@bp.route('/jobs', methods=['POST'])
+def create_job():
+    blob, err = read_docx_upload()
+    if err:
+        return err
+    kind = (request.form.get('kind') or 'gherkin').strip().lower()
+    if kind not in JOB_KINDS or kind == 'batch':
+        return jsonify({'error': "Invalid kind (expected one of gherkin, playwright)"}), 400
+    mode, flags, guidelines = get_mode_flags_guidelines(request.form)
+    return enqueue_job(kind, blob, mode, flags, guidelines)
+
+def enqueue_job(kind: str, blob, mode: str, flags, guidelines: str, targets=None):
+    expire_jobs()
+    pending = sum(1 for j in iter_jobs() if job_view(j)['status'] in ('queued', 'running'))
+    if pending >= JOBS_MAX_PENDING:
+        resp = make_response(jsonify({'error': 'Job queue is full', 'pending': pending}), 429)
+        resp.headers['Retry-After'] = '5'
+        return resp
+    job_id = uuid.uuid4().hex
+    job = {'id': job_id, 'kind': kind, 'mode': mode, 'status': 'queued', 'progress': {'done': 0, 'total': 0},
+           'createdAt': time.time(), 'finishedAt': None, 'error': None}
+    write_job(job)
+    pool = get_job_pool()
+    future = pool.submit(run_job, job_id, kind, blob, mode, flags, guidelines, targets)
+    with jobs_lock:
+        job_futures[job_id] = future
+    future.add_done_callback(lambda f: finish_job(job_id, pool, f))
+    resp = make_response(jsonify(job_view(job)), 202)
+    resp.headers['Location'] = f'/jobs/{job_id}'
+    return resp
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    expire_jobs()
+    job = read_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job_view(job)), 200
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    expire_jobs()
+    job = read_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    view = job_view(job)
+    try:
+        f = open(job_path(job_id, '.result'), 'rb') if view['status'] == 'done' else None
+    except OSError:
+        f = None
+    if f is None:
+        return jsonify({'error': 'Job has no result', 'status': view['status'], 'jobError': job['error']}), 409
+    download_name, mimetype = JOB_KINDS[job['kind']]
+    return send_file(f, as_attachment=True, download_name=download_name, mimetype=mimetype)
+
+@bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    # queued/running jobs get a cancel marker (honoured by whichever process runs them); finished jobs are removed
+    job = read_job(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job'}), 404
+    if job['status'] in ('queued', 'running'):
+        open(job_path(job_id, '.cancel'), 'a').close()
+        with jobs_lock:
+            future = job_futures.get(job_id)
+        if future is not None:
+            future.cancel()
+        return jsonify(job_view(job)), 200
+    remove_job(job_id)
+    return jsonify({'id': job_id, 'status': 'deleted'}), 200
+
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', str(os.cpu_count() or 1)))
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', '200'))
+BATCH_MAX_BYTES = int(os.environ.get('BATCH_MAX_BYTES', str(512 * 1024 * 1024)))
+BATCH_TARGETS = {'gherkin': ('gherkin',), 'playwright': ('playwright',), 'both': ('gherkin', 'playwright')}
+
+batch_pool = None
+batch_pool_pid = None
+batch_pool_lock = threading.Lock()
+
+def get_batch_pool():
+    global batch_pool, batch_pool_pid
+    with batch_pool_lock:
+        if batch_pool is None or batch_pool_pid != os.getpid():
+            batch_pool = ProcessPoolExecutor(max_workers=BATCH_MAX_WORKERS, mp_context=multiprocessing.get_context(JOBS_MP_START), initializer=init_pool_worker)
+            batch_pool_pid = os.getpid()
+        return batch_pool
+
+def reset_batch_pool(pool):
+    global batch_pool
+    with batch_pool_lock:
+        if batch_pool is pool:
+            batch_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def render_batch_item(name: str, blob: bytes, mode: str, flags, guidelines: str, kinds):
+    # executes inside a pool process; failures are returned per file instead of raised
+    try:
+        outputs = {}
+        if 'gherkin' in kinds:
+            out = io.BytesIO()
+            generate_gherkin_document(blob, out, mode=mode, flags=flags, guidelines=guidelines)
+            outputs['gherkin'] = out.getvalue()
+        if 'playwright' in kinds:
+            out = io.BytesIO()
+            generate_playwright_ts(blob, out, mode=mode, flags=flags)
+            outputs['playwright'] = out.getvalue()
+        return {'name': name, 'outputs': outputs, 'totals': compute_overview_totals(load_requirements(blob), mode, flags=flags), 'error': None}
+    except Exception as e:
+        return {'name': name, 'outputs': {}, 'totals': None, 'error': f'{type(e).__name__}: {e}'}
+
+def read_batch_uploads():
+    # (name, bytes) for every .docx in the uploaded zip archive(s) and/or plain .docx file parts
+    items, total = [], 0
+    for file in request.files.getlist('file') + request.files.getlist('archive'):
+        fname = file.filename or ''
+        if fname.lower().endswith('.docx'):
+            blob = file.read()
+            if total + len(blob) > BATCH_MAX_BYTES:
+                raise ValueError('Batch exceeds BATCH_MAX_BYTES')
+            total += len(blob)
+            entries = [(fname, blob)]
+        elif fname.lower().endswith('.zip'):
+            entries = []
+            try:
+                with zipfile.ZipFile(file.stream) as zf:
+                    for info in zf.infolist():
+                        base = os.path.basename(info.filename)
+                        if info.is_dir() or not base.lower().endswith('.docx') or base.startswith('~$') or info.filename.startswith('__MACOSX/'):
+                            continue
+                        if total + info.file_size > BATCH_MAX_BYTES:
+                            raise ValueError('Batch exceeds BATCH_MAX_BYTES')
+                        total += info.file_size
+                        entries.append((info.filename, zf.read(info)))
+            except zipfile.BadZipFile:
+                raise ValueError(f'Invalid zip archive: {fname}')
+        else:
+            raise ValueError(f'Invalid file (.docx or .zip expected): {fname}')
+        items.extend(entries)
+        if len(items) > BATCH_MAX_FILES:
+            raise ValueError('Batch exceeds BATCH_MAX_FILES')
+    return items
+
+def batch_output_stem(name: str, used: set) -> str:
+    stem = os.path.splitext(os.path.basename(name.replace('\\', '/')))[0] or 'document'
+    candidate, n = stem, 1
+    while candidate in used:
+        n += 1
+        candidate = f'{stem}-{n}'
+    used.add(candidate)
+    return candidate
+
+def write_batch_zip(results, out, mode: str, targets: str, flags) -> tuple:
+    # the per-file outputs plus overview.json; returns (files listed, files with errors)
+    totals = {'totalRequirements': 0, 'totalFitCriteria': 0, 'totalScenarios': 0}
+    outline = [0, 0, 0, 0]
+    files, used = [], set()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for r in results:
+            entry = {'name': r['name'], 'outputs': [], 'totals': r['totals'], 'error': r['error']}
+            if not r['error']:
+                stem = batch_output_stem(r['name'], used)
+                if 'gherkin' in r['outputs']:
+                    entry['outputs'].append(f'{stem}.gherkin.docx')
+                    zf.writestr(f'{stem}.gherkin.docx', r['outputs']['gherkin'])
+                if 'playwright' in r['outputs']:
+                    entry['outputs'].append(f'{stem}.spec.ts')
+                    zf.writestr(f'{stem}.spec.ts', r['outputs']['playwright'])
+                for k in totals:
+                    totals[k] += r['totals'][k]
+                if 'outline' in r['totals']:
+                    o = r['totals']['outline']
+                    outline[:] = map(sum, zip(outline, (o['scenarios'], o['outlineScenarios'], o['paragraphs'], o['outlineParagraphs'])))
+            files.append(entry)
+        if flags.get('opt_outline'):
+            totals['outline'] = outline_totals(outline)
+        errors = sum(1 for f in files if f['error'])
+        zf.writestr('overview.json', json.dumps({'mode': mode, 'targets': targets, 'files': files, 'overviewTotals': totals, 'errors': errors}, indent=2))
+    return len(files), errors
+
+def render_batch(items, out, mode: str, flags, guidelines: str, targets: str, progress=None):
+    # job-backed batch: runs inside a job pool process, one file after another
+    results = []
+    for i, (name, blob) in enumerate(items, 1):
+        results.append(render_batch_item(name, blob, mode, flags, guidelines, BATCH_TARGETS[targets]))
+        if progress:
+            progress(i, len(items))
+    return write_batch_zip(results, out, mode, targets, flags)
+
+@bp.route('/batch', methods=['POST'])
+def batch():
+    try:
+        with timed('receive'):
+            items = read_batch_uploads()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not items:
+        return jsonify({'error': 'No .docx files in request'}), 400
+    targets = (request.form.get('targets') or 'both').strip().lower()
+    if targets not in BATCH_TARGETS:
+        return jsonify({'error': f"Invalid targets (expected one of {', '.join(BATCH_TARGETS)})"}), 400
+    mode, flags, guidelines = get_mode_flags_guidelines(request.form)
+    if request.form.get('async') == '1':
+        return enqueue_job('batch', items, mode, flags, guidelines, targets)
+    t0 = time.perf_counter()
+    pool = get_batch_pool()
+    futures = [pool.submit(render_batch_item, name, blob, mode, flags, guidelines, BATCH_TARGETS[targets]) for name, blob in items]
+    results = []
+    for (name, _), future in zip(items, futures):
+        try:
+            with timed('render'):
+                results.append(future.result())
+        except BrokenProcessPool as e:
+            results.append({'name': name, 'outputs': {}, 'totals': None, 'error': f'worker crashed: {e}'})
+            reset_batch_pool(pool)
+    for r in results:
+        if r['totals']:
+            count_document(r['totals']['totalRequirements'], r['totals']['totalFitCriteria'], r['totals']['totalScenarios'])
+    out = spooled_output()
+    try:
+        with timed('serialize'):
+            n_files, errors = write_batch_zip(results, out, mode, targets, flags)
+        elapsed = round(time.perf_counter() - t0, 3)
+        resp = send_output(out, 'gherkin_batch.zip', 'application/zip', elapsed)
+        resp.headers['X-Batch-Files'] = str(n_files)
+        resp.headers['X-Batch-Errors'] = str(errors)
+        return resp
+    except Exception:
+        out.close()
+        raise
+
+warmup_state = {'ready': False, 'seconds': None, 'error': None}
+warmup_pid = None
+
+def warm_up():
+    # loads the output templates and runs a one-requirement document through parsing and every renderer in all
+    # modes, so the first real request doesn't pay for it; caches and metrics are not touched
+    t0 = time.perf_counter()
+    try:
+        load_docx_template()
+        if DOCX_WRITER == 'python-docx':
+            new_docx_document()
+        sample = io.BytesIO()
+        texts = ['[WARM-1] Warm-up', 'Requirement', 'As an operator I want warm-up', 'Rationale', 'Readiness', 'Fit Criteria', 'login: works', '- search > works', 'plain']
+        write_gherkin_docx_stream(map(wml_paragraph, texts), [], sample)
+        data = parse_docx(io.BytesIO(sample.getvalue()))
+        for mode in ('optimized', 'atomized', 'ultra-optimized'):
+            for r, plan in zip(data, build_plans(data, mode)):
+                gherkin_paragraphs_for_requirement(r, mode, {}, plan)
+                render_ts_block_for_requirement(r, mode, ScenarioPlan(r, mode))
+                feature_block_for_requirement(r, mode, plan)
+            build_traceability(data, mode, top_n=0)
+        warmup_state['ready'] = True
+    except Exception as e:
+        warmup_state['error'] = f'{type(e).__name__}: {e}'
+    warmup_state['seconds'] = round(time.perf_counter() - t0, 3)
+
+def start_warm_up():
+    global warmup_pid
+    if multiprocessing.parent_process() is not None:
+        return  # pool processes only import this module to run tasks; they never serve requests
+    warmup_pid = os.getpid()
+    if WARMUP == 'off':
+        warmup_state['ready'] = True
+    elif WARMUP == 'sync':
+        warm_up()
+    elif not warmup_state['ready']:
+        threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    if not warmup_state['ready'] and warmup_pid != os.getpid():
+        start_warm_up()  # forked (preload) while a background warm-up was still running: that thread did not survive
+    return jsonify(warmup_state), 200 if warmup_state['ready'] else 503
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app, resources={r"/*": {"origins": FRONTEND_ORIGIN}}, expose_headers=EXPOSED_HEADERS)
+    app.register_blueprint(bp)
+    start_warm_up()
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', '5000'))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,16 @@
+# picked up automatically by `gunicorn gherkin_backend:app` when started from this directory
+import gc, os
+
+# import the app (and warm it up) once in the master; workers fork with the templates, compiled regexes and
+# module state already in memory and share those pages copy-on-write
+preload_app = True
+os.environ.setdefault('WARMUP', 'sync')
+
+def when_ready(server):
+    # keep the preloaded objects out of future GC passes so collections in workers don't touch (and copy) their pages
+    gc.freeze()
+
+def on_starting(server):
+    # /metrics merges per-process snapshot files; start every server run from zero
+    from gherkin_backend import clear_metrics
+    clear_metrics()
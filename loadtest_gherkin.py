@@ -0,0 +1,208 @@
+import argparse, json, math, os, random, socket, subprocess, sys, threading, time, urllib.error, urllib.request, uuid
+
+from bench_gherkin import synthetic_docx
+
+ENDPOINTS = ('preview', 'upload', 'generate_playwright')
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def multipart_body(fields: dict, filename: str, blob: bytes):
+    boundary = uuid.uuid4().hex
+    parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode('utf-8') for k, v in fields.items()]
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                 f'Content-Type: application/vnd.openxmlformats-officedocument.wordprocessingml.document\r\n\r\n'.encode('utf-8'))
+    parts.append(blob)
+    parts.append(f'\r\n--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+def start_gunicorn(args, port: int):
+    env = dict(os.environ)
+    if args.cold:
+        env.update(PARSE_CACHE_MAX_ENTRIES='0', RENDER_CACHE_MAX_ENTRIES='0', RESULT_STORE_MAX_BYTES='0')
+    for item in args.env:
+        k, _, v = item.partition('=')
+        env[k] = v
+    cmd = [sys.executable, '-m', 'gunicorn', 'gherkin_backend:app', '--bind', f'127.0.0.1:{port}',
+           '--workers', str(args.workers), '--threads', str(args.threads), '--worker-class', args.worker_class,
+           '--timeout', str(args.timeout), '--log-level', 'warning']
+    proc = subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f'gunicorn exited with status {proc.returncode}')
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/healthz', timeout=1).read()
+            return proc
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.2)
+    proc.terminate()
+    raise SystemExit('gunicorn did not become healthy within 30s')
+
+def child_pids(pid: int):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # ppid is the 2nd field after the parenthesised comm, which may itself contain spaces
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return pids
+
+def rss_kib(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+class RssSampler(threading.Thread):
+    # peak and last RSS per gunicorn worker, sampled from /proc while the load runs
+    def __init__(self, master_pid: int, interval: float = 0.5):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak = {}
+        self.last = {}
+        self.stopped = threading.Event()
+
+    def sample(self):
+        for pid in [self.master_pid] + child_pids(self.master_pid):
+            kib = rss_kib(pid)
+            if kib:
+                self.last[pid] = kib
+                self.peak[pid] = max(self.peak.get(pid, 0), kib)
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.sample()
+            self.stopped.wait(self.interval)
+
+def parse_mix(spec: str):
+    weights = {}
+    for item in spec.split(','):
+        name, _, w = item.partition(':')
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f'unknown endpoint in --mix: {name}')
+        weights[name.strip()] = float(w or 1)
+    return weights
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered), max(1, math.ceil(q / 100 * len(ordered)))) - 1]
+
+def client(base_url: str, docs, weights, mode: str, deadline: float, remaining, results, lock, seed: int):
+    rnd = random.Random(seed)
+    names, cum = list(weights), list(weights.values())
+    while time.monotonic() < deadline:
+        with lock:
+            if remaining[0] <= 0:
+                return
+            remaining[0] -= 1
+        endpoint = rnd.choices(names, weights=cum)[0]
+        size, blob = rnd.choice(docs)
+        body, ctype = multipart_body({'mode': mode}, f'load-{size}.docx', blob)
+        req = urllib.request.Request(f'{base_url}/{endpoint}', data=body, headers={'Content-Type': ctype}, method='POST')
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=300) as resp:
+                nbytes = len(resp.read())
+                status = resp.status
+        except urllib.error.HTTPError as e:
+            status, nbytes = e.code, 0
+        except (urllib.error.URLError, OSError):
+            status, nbytes = 0, 0
+        with lock:
+            results.append((endpoint, size, time.perf_counter() - t0, status, nbytes))
+
+def summarize(results, wall: float):
+    def stats(rows):
+        lat = [r[2] for r in rows]
+        errors = sum(1 for r in rows if not 200 <= r[3] < 300)
+        return {'requests': len(rows), 'errors': errors, 'errorRate': round(errors / len(rows), 4) if rows else 0.0,
+                'throughput': round(len(rows) / wall, 2) if wall else 0.0,
+                'p50': round(percentile(lat, 50), 4), 'p95': round(percentile(lat, 95), 4), 'p99': round(percentile(lat, 99), 4)}
+    out = {'all': stats(results)}
+    for endpoint in ENDPOINTS:
+        rows = [r for r in results if r[0] == endpoint]
+        if rows:
+            out[endpoint] = stats(rows)
+    for size in sorted({r[1] for r in results}):
+        out[f'size={size}'] = stats([r for r in results if r[1] == size])
+    return out
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the Gherkin backend endpoints under gunicorn.')
+    parser.add_argument('--url', help='target an already running server instead of starting gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--worker-class', default='gthread', help='sync, gthread, gevent, ...')
+    parser.add_argument('--timeout', type=int, default=120, help='gunicorn worker timeout')
+    parser.add_argument('--env', action='append', default=[], help='KEY=VALUE passed to the server environment')
+    parser.add_argument('--cold', action='store_true', help='disable the parse and render caches and the result store on the server')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many requests (0 = duration only)')
+    parser.add_argument('--sizes', default='20,200,1000', help='requirement counts of the documents in the mix')
+    parser.add_argument('--fits', type=int, default=8)
+    parser.add_argument('--mix', default='preview:2,upload:1,generate_playwright:1', help='endpoint:weight list')
+    parser.add_argument('--mode', default='optimized')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    weights = parse_mix(args.mix)
+    docs = [(n, synthetic_docx(n, args.fits, 4, seed=args.seed)) for n in (int(x) for x in args.sizes.split(',') if x)]
+    proc, sampler = None, None
+    base_url = (args.url or '').rstrip('/')
+    if not base_url:
+        port = free_port()
+        proc = start_gunicorn(args, port)
+        base_url = f'http://127.0.0.1:{port}'
+        sampler = RssSampler(proc.pid)
+        sampler.start()
+    try:
+        results, lock = [], threading.Lock()
+        remaining = [args.requests or float('inf')]
+        t0 = time.monotonic()
+        deadline = t0 + args.duration
+        threads = [threading.Thread(target=client, args=(base_url, docs, weights, args.mode, deadline, remaining, results, lock, args.seed + i))
+                   for i in range(args.clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.monotonic() - t0
+        report = {'config': {k: v for k, v in vars(args).items() if k != 'output'}, 'wallSeconds': round(wall, 2), 'summary': summarize(results, wall)}
+        if sampler:
+            sampler.sample()
+            report['rssKiB'] = {('master' if pid == proc.pid else str(pid)): {'peak': sampler.peak[pid], 'last': sampler.last.get(pid, 0)} for pid in sampler.peak}
+    finally:
+        if sampler:
+            sampler.stopped.set()
+        if proc:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    print(f"{'':<22}{'reqs':>7}{'err%':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, s in report['summary'].items():
+        print(f"{name:<22}{s['requests']:>7}{s['errorRate'] * 100:>8.1f}{s['throughput']:>9.2f}{s['p50'] * 1000:>10.1f}{s['p95'] * 1000:>10.1f}{s['p99'] * 1000:>10.1f}")
+    for name, r in report.get('rssKiB', {}).items():
+        print(f"rss {name:<18}peak {r['peak'] / 1024:8.1f} MiB  last {r['last'] / 1024:8.1f} MiB")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['summary']['all']['errors'] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
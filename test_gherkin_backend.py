@@ -0,0 +1,242 @@
+import hashlib, io, json, os, shutil, subprocess, uuid
+
+import pytest
+from docx import Document
+
+import gherkin_backend as gb
+from bench_gherkin import reset_caches, synthetic_docx
+
+BLOB = synthetic_docx(40, 3, 4, seed=7)
+OUTLINE = {'opt_outline': True}
+# fits per theme; optimized mode buckets them into tests of these many checks
+BUCKET_SHAPES = [
+    [('login', 9), ('search', 1), ('export', 1)],
+    [('login', 2), ('search', 2), ('export', 1)],
+    [('login', 2), ('search', 1), ('export', 2), ('audit', 1)],
+    [('login', 5)],
+]
+# stub Playwright: runs every test and prints how many checks ran
+TS_HARNESS = '''const BASE_URL = '';
+const runs = []; let checked = 0;
+const test = (name, fn) => runs.push(fn({ page: { goto: async () => {}, getByTestId: (id) => id } }));
+test.describe = (name, fn) => fn();
+const expect = () => ({ toBeVisible: async () => { checked++; } });
+'''
+
+def docx_content(blob: bytes):
+    doc = Document(io.BytesIO(blob))
+    paragraphs = [(p.text, p.style.name) for p in doc.paragraphs]
+    tables = [[[c.text for c in row.cells] for row in t.rows] for t in doc.tables]
+    return paragraphs, tables
+
+def render(generate, mode: str) -> bytes:
+    reset_caches()
+    out = io.BytesIO()
+    generate(io.BytesIO(BLOB), out, mode)
+    return out.getvalue()
+
+def output_digest(parts) -> str:
+    return hashlib.sha256('\n\0'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+def bucket_requirement(shape) -> dict:
+    fits = [f'{theme}: outcome {i} of {theme} is shown' for theme, n in shape for i in range(n)]
+    return {'ReqID': 'R-1', 'ReqName': 'Mixed', 'Topic': 'Mixed', 'Requirement': 'The user shall sign in.', 'FitCriteria': fits}
+
+def test_plan_renders_pinned_output():
+    r = {'ReqID': 'R-7', 'ReqName': 'Checkout', 'Topic': 'Checkout', 'Requirement': 'As an operator I want to check out orders',
+         'FitCriteria': ['Payment: card is charged once', 'Payment: receipt is emailed', 'Search: order is findable', 'Totals are rounded to cents']}
+    assert gb.render_ts_block_for_requirement(r, 'optimized') == '\n'.join([
+        "test.describe('R-7 Checkout', () => {",
+        "  test('Checkout payment', async ({ page }) => {",
+        "    await page.goto(`${BASE_URL}/dashboard`); // pre-auth assumed",
+        "    // Then: Payment: card is charged once",
+        "    await expect(page.getByTestId('payment-card-is-charged-once')).toBeVisible();",
+        "    // And: Payment: receipt is emailed",
+        "    await expect(page.getByTestId('payment-receipt-is-emailed')).toBeVisible();",
+        "  });",
+        "  test('Checkout search', async ({ page }) => {",
+        "    await page.goto(`${BASE_URL}/dashboard`); // pre-auth assumed",
+        "    // Then: Search: order is findable",
+        "    await expect(page.getByTestId('search-order-is-findable')).toBeVisible();",
+        "  });",
+        "  test('Checkout misc', async ({ page }) => {",
+        "    await page.goto(`${BASE_URL}/dashboard`); // pre-auth assumed",
+        "    // Then: Totals are rounded to cents",
+        "    await expect(page.getByTestId('totals-are-rounded-to-cents')).toBeVisible();",
+        "  });",
+        "});",
+    ])
+    given = ['Given the user is logged in', 'When the system evaluates requirement R-7']
+    assert gb.gherkin_paragraphs_for_requirement(r, 'optimized', {}) == [
+        'REQ ID: R-7', 'REQ NAME: Checkout', '', 'Feature: Checkout', 'As a the user', 'I want checkout', 'So that business value is achieved', '',
+        '@REQ-R-7', 'Scenario: Checkout — Payment', *given, 'Then Payment: card is charged once', 'And Payment: receipt is emailed', '',
+        '@REQ-R-7', 'Scenario: Checkout — Search', *given, 'Then Search: order is findable', '',
+        '@REQ-R-7', 'Scenario: Checkout — Group 3', *given, 'Then Totals are rounded to cents', '',
+    ]
+    trace = gb.build_traceability([r], 'optimized', 5)
+    assert [n['name'] for n in trace['nodes']] == ['REQ:R-7', 'SC:R-7:1', 'TH:payment', 'SC:R-7:2', 'TH:search', 'SC:R-7:3', 'TH:misc']
+    assert [(l['source'], l['target'], l['value']) for l in trace['links']] == [
+        ('REQ:R-7', 'SC:R-7:1', 2), ('SC:R-7:1', 'TH:payment', 2), ('REQ:R-7', 'SC:R-7:2', 1),
+        ('SC:R-7:2', 'TH:search', 1), ('REQ:R-7', 'SC:R-7:3', 1), ('SC:R-7:3', 'TH:misc', 1)]
+
+# (render_ts_block_for_requirement, gherkin_paragraphs_for_requirement, build_traceability) output of the
+# renderers before ScenarioPlan, for synthetic_docx(30, 6, 4, seed=11)
+PRE_PLAN_DIGESTS = {
+    'atomized': ('f0d1cd7ede06035f', '3779949acff30dd0', 'd94179824e890b38'),
+    'optimized': ('ef79cc708edb3dd1', 'f0e0d31ec9b20391', 'eaeb86af264112da'),
+    'ultra-optimized': ('4c3a61022e223cff', '3752ff1631fc545d', '3d9a49d4b03f980c'),
+}
+
+@pytest.mark.parametrize('mode', sorted(PRE_PLAN_DIGESTS))
+def test_plan_renders_match_pre_plan_output(mode):
+    data = gb.load_requirements(io.BytesIO(synthetic_docx(30, 6, 4, seed=11)))
+    plans = gb.build_plans(data, mode)
+    assert (output_digest(gb.render_ts_block_for_requirement(r, mode, plan) for r, plan in zip(data, plans)),
+            output_digest('\n'.join(gb.gherkin_paragraphs_for_requirement(r, mode, {}, plan)) for r, plan in zip(data, plans)),
+            output_digest([json.dumps(gb.build_traceability(data, mode, 10, plans), sort_keys=True)])) == PRE_PLAN_DIGESTS[mode]
+
+def test_stream_parser_matches_python_docx(tmp_path):
+    path = tmp_path / 'reqs.docx'
+    path.write_bytes(BLOB)
+    data = gb.parse_requirements_from_docx(str(path))
+    assert data
+    assert gb.parse_requirements_from_docx_stream(io.BytesIO(BLOB)) == data
+
+@pytest.mark.parametrize('mode', ['optimized', 'atomized'])
+def test_stream_writer_matches_python_docx(monkeypatch, mode):
+    stream = render(gb.generate_gherkin_document, mode)
+    monkeypatch.setattr(gb, 'DOCX_WRITER', 'python-docx')
+    assert docx_content(stream) == docx_content(render(gb.generate_gherkin_document, mode))
+
+def use_render_pool(monkeypatch):
+    monkeypatch.setattr(gb, 'PARALLEL_RENDER_WORKERS', 2)
+    monkeypatch.setattr(gb, 'PARALLEL_RENDER_MIN_REQS', 1)
+    monkeypatch.setattr(gb, 'PARALLEL_RENDER_MIN_CHUNK', 4)
+
+@pytest.mark.parametrize('generate', [gb.generate_gherkin_document, gb.generate_playwright_ts])
+def test_parallel_render_matches_serial(monkeypatch, generate):
+    monkeypatch.setattr(gb, 'PARALLEL_RENDER_WORKERS', 1)
+    serial = render(generate, 'optimized')
+    use_render_pool(monkeypatch)
+    assert render(generate, 'optimized') == serial
+
+def test_parallel_render_falls_back_when_the_pool_was_shut_down(monkeypatch):
+    monkeypatch.setattr(gb, 'PARALLEL_RENDER_WORKERS', 1)
+    serial = render(gb.generate_playwright_ts, 'optimized')
+    use_render_pool(monkeypatch)
+    pool = gb.get_render_pool()
+    gb.reset_render_pool(pool)  # as another request's reset would, before this one submits
+    monkeypatch.setattr(gb, 'get_render_pool', lambda: pool)
+    assert render(gb.generate_playwright_ts, 'optimized') == serial
+
+def test_parallel_render_falls_back_when_its_futures_are_cancelled(monkeypatch):
+    use_render_pool(monkeypatch)
+    data = gb.load_requirements(io.BytesIO(BLOB))
+    pool = gb.get_render_pool()
+    pending = gb.ParallelRenders(pool, 'ts', data, list(range(len(data))), 'optimized', {})
+    gb.reset_render_pool(pool)
+    for i, r in enumerate(data):
+        assert pending.pop(i) in (None, gb.render_ts_block_for_requirement(r, 'optimized'))
+
+@pytest.mark.parametrize('shape', BUCKET_SHAPES)
+@pytest.mark.parametrize('mode', ['optimized', 'atomized'])
+def test_ts_outline_loops_over_tests_with_the_same_check_count(mode, shape):
+    r = bucket_requirement(shape)
+    plan = gb.ScenarioPlan(r, mode)
+    tests = gb.ts_tests_for_requirement(r, mode, plan)
+    ts = gb.render_ts_block_for_requirement(r, mode, plan, True)
+    # one loop or test() per Gherkin scenario block, the same grouping as the .docx and .feature outlines
+    blocks = gb.outline_counts(r, mode, plan)[1]
+    assert sum(line.startswith(('  test(', '  for (')) for line in ts.splitlines()) == blocks
+    for line in ts.splitlines():
+        if line.startswith('    { name:'):
+            single = ', fit: ' in line
+            assert single != ('checks: [' in line)
+    if shutil.which('node') is None:
+        pytest.skip('node is not installed')
+    script = TS_HARNESS + ts + '\nPromise.all(runs).then(() => console.log(JSON.stringify([runs.length, checked])));\n'
+    out = subprocess.run(['node', '-e', script], capture_output=True, text=True, timeout=60)
+    assert out.returncode == 0, out.stderr
+    assert json.loads(out.stdout) == [len(tests), len(r['FitCriteria'])]
+
+@pytest.mark.parametrize('mode', ['optimized', 'atomized', 'ultra-optimized'])
+def test_docx_outline_matches_outline_counts(mode):
+    for shape in BUCKET_SHAPES:
+        r = bucket_requirement(shape)
+        plan = gb.ScenarioPlan(r, mode, OUTLINE)
+        before, after, para_before, para_after = gb.outline_counts(r, mode, plan)
+        plain = gb.gherkin_paragraphs_for_requirement(r, mode, {}, plan)
+        outlined = gb.gherkin_paragraphs_for_requirement(r, mode, OUTLINE, plan)
+        assert before == plan.scenario_count == sum(p.startswith('Scenario: ') for p in plain)
+        assert after == sum(p.startswith(('Scenario: ', 'Scenario Outline: ')) for p in outlined)
+        assert para_before - para_after == len(plain) - len(outlined)
+
+@pytest.mark.parametrize('mode', ['optimized', 'atomized'])
+def test_feature_outline_expands_to_the_plain_scenarios(mode):
+    pytest.importorskip('gherkin')
+    from gherkin.parser import Parser
+    from gherkin.pickles.compiler import Compiler
+
+    def pickles(outline: bool):
+        text = ''.join(gb.feature_block_for_requirement(r, mode, gb.ScenarioPlan(r, mode), outline=outline)
+                       for r in map(bucket_requirement, BUCKET_SHAPES[:1]))
+        found = Compiler().compile({**Parser().parse(text), 'uri': 'x.feature'})
+        return sorted((p['name'], tuple(step['text'] for step in p['steps'])) for p in found)
+    assert pickles(True) == pickles(False)
+
+def test_preview_outline_totals():
+    client = gb.app.test_client()
+    body = client.post('/preview', data={'file': (io.BytesIO(BLOB), 'spec.docx'), 'mode': 'atomized', 'opt_outline': '1'}).get_json()
+    counts = [0, 0, 0, 0]
+    for r in gb.load_requirements(io.BytesIO(BLOB)):
+        counts = list(map(sum, zip(counts, gb.outline_counts(r, 'atomized', gb.ScenarioPlan(r, 'atomized')))))
+    assert body['overviewTotals']['outline'] == gb.outline_totals(counts)
+    assert body['overviewTotals']['outline']['scenarioReduction'] > 0
+
+@pytest.fixture
+def result_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(gb, 'RESULT_STORE_DIR', str(tmp_path))
+
+def regen_counts(resp):
+    report = json.loads(resp.headers['X-Regen-Report'])
+    return report['addedCount'], report['changedCount'], report['removedCount']
+
+@pytest.mark.parametrize('path, form', [('/upload', {}), ('/generate_playwright', {'buffered': '1'})])
+def test_stored_results_still_update_the_revision_index(result_store, path, form):
+    client = gb.app.test_client()
+    a, b = synthetic_docx(11, 3, 3, seed=1), synthetic_docx(12, 3, 3, seed=1)
+    key = uuid.uuid4().hex
+
+    def send(blob, doc_key):
+        return client.post(path, data={'file': (io.BytesIO(blob), 'spec.docx'), 'doc_key': doc_key, **form})
+    send(a, uuid.uuid4().hex)
+    first = send(a, key)
+    assert first.headers['X-Result-Cache'] == 'hit' and regen_counts(first) == (11, 0, 0)
+    assert regen_counts(send(b, key)) == (1, 0, 0)
+    back = send(a, key)
+    assert back.headers['X-Result-Cache'] == 'hit' and regen_counts(back) == (0, 0, 1)
+    assert 'X-Process-Time' in back.headers
+
+def test_streamed_and_buffered_playwright_are_stored_apart(result_store):
+    client = gb.app.test_client()
+    blob = synthetic_docx(5, 2, 2, seed=3)
+    streamed = client.post('/generate_playwright', data={'file': (io.BytesIO(blob), 'spec.docx')})
+    assert streamed.get_data()
+    buffered = client.post('/generate_playwright', data={'file': (io.BytesIO(blob), 'spec.docx'), 'buffered': '1'})
+    assert buffered.headers['X-Result-Cache'] == 'miss' and 'X-Process-Time' in buffered.headers
+    assert buffered.get_data() == streamed.get_data() and buffered.headers['ETag'] != streamed.headers['ETag']
+
+def test_streamed_preview_stays_bounded_and_remembers_requirements(result_store, monkeypatch):
+    monkeypatch.setattr(gb, 'PARSE_CACHE_MAX_BYTES', 4096)
+    client = gb.app.test_client()
+    blob = synthetic_docx(60, 4, 3, seed=5)
+    digest = gb.docx_digest(blob)
+    gb.PARSE_CACHE.clear()
+    lines = client.post('/preview', data={'file': (io.BytesIO(blob), 'spec.docx'), 'stream': '1'}).get_data(as_text=True).splitlines()
+    assert sum(json.loads(line)['type'] == 'requirement' for line in lines) == 60
+    assert gb.PARSE_CACHE.get(digest) is None  # too big for the cache, so nothing was collected for it
+    with open(os.path.join(gb.RESULT_STORE_DIR, gb.requirements_etag(digest)), encoding='utf-8') as f:
+        stored = json.load(f)
+    assert stored == gb.parse_requirements_from_docx_stream(io.BytesIO(blob))
+    page = client.post('/traceability', data={'digest': digest, 'limit': '5'}).get_json()
+    assert page['meta']['reqs'] == 60 and page['meta']['returned'] == 5